@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+
+"""
+Benchmark and equivalence check of ``range_t``, the structure used on ``YTStor.read`` hot path. No FUSE mount nor
+network access is needed.
+
+First, random sequences of operations are run against ``range_t`` and a trivially correct model (a bitmap), and
+results of every query are compared. Script exits with non-zero status on the first mismatch. Then operations are
+timed against realistic fragmentation patterns of ``YTStor.avail``:
+
+``sequential``
+    File filled front to back by equal chunks, as during normal playback.
+``seeks``
+    Windows downloaded around random positions, as when a user jumps through the movie.
+``holes``
+    Thousands of small holes, the worst case.
+
+Run from repository root::
+
+    $ python3 bench/bench_range_t.py             # check and benchmark
+    $ python3 bench/bench_range_t.py --no-bench  # only check, e.g. in CI
+"""
+
+import os
+import sys
+import random
+import tracemalloc
+from argparse import ArgumentParser
+from time import perf_counter
+
+# import module directly, so neither FUSE nor other YTFS dependencies are needed.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "ytfs"))
+
+from range_t import range_t
+
+
+class Model():
+
+    """
+    Reference model of ``range_t``: every value is a separate flag in a bitmap. Slow, but obviously correct.
+
+    Parameters
+    ----------
+    size : int
+        Universe size. Only values below `size` may be used.
+    """
+
+    def __init__(self, size):
+        self.bits = bytearray(size)
+
+    def add(self, start, end):
+        self.bits[start:end] = b'\x01' * (end - start)
+
+    def remove(self, start, end):
+        self.bits[start:end] = bytes(end - start)
+
+    def subranges(self):
+
+        "Present values, grouped into maximal subranges, in ascending order."
+
+        ret = []
+        start = None
+
+        for i, b in enumerate(self.bits):
+            if b and start is None:
+                start = i
+            elif not b and start is not None:
+                ret.append((start, i))
+                start = None
+
+        if start is not None:
+            ret.append((start, len(self.bits)))
+
+        return ret
+
+    def contains(self, start, end):
+        return sum(self.bits[start:end])
+
+    def holds(self, start, end):
+        return all(self.bits[start:end])
+
+    def match(self, start, end):
+        # subranges overlapping on [start, end] - one that begins exactly at end counts too.
+        return {r for r in self.subranges() if r[0] <= end and r[1] > start}
+
+    def missing(self, start, end):
+        ret = []
+        for i in range(start, end):
+            if self.bits[i]:
+                continue
+            if ret and ret[-1][1] == i:
+                ret[-1] = (ret[-1][0], i + 1)
+            else:
+                ret.append((i, i + 1))
+        return ret
+
+    def first_missing(self, offset):
+        while offset < len(self.bits) and self.bits[offset]:
+            offset += 1
+        return offset
+
+
+def check(iterations, size=300, seed=0):
+
+    """
+    Run random operations on ``range_t`` and ``Model`` and compare results.
+
+    Parameters
+    ----------
+    iterations : int
+        Number of random operation sequences.
+    size : int
+        Universe size. Small values result in many merges and splits.
+    seed : int
+        Random seed.
+
+    Raises
+    ------
+    AssertionError
+        When ``range_t`` disagrees with the model.
+    """
+
+    rnd = random.Random(seed)
+
+    def rand_range(maxlen=40):
+        start = rnd.randrange(size - maxlen)
+        return (start, start + rnd.randrange(1, maxlen))
+
+    for it in range(iterations):
+
+        r = range_t()
+        m = Model(size)
+
+        for step in range(rnd.randrange(1, 30)):
+
+            op = rnd.randrange(8)
+            batch = [rand_range() for _ in range(rnd.randrange(4))]
+
+            if op == 0:
+                (a, b) = batch[0] if batch else rand_range()
+                r += (a, b)
+                m.add(a, b)
+            elif op == 1:
+                (a, b) = batch[0] if batch else rand_range()
+                r -= (a, b)
+                m.remove(a, b)
+            elif op == 2:
+                (a, b) = rand_range()
+                r = r + range(a, b)
+                m.add(a, b)
+            elif op == 3:
+                (a, b) = rand_range()
+                r = r - [a, b]
+                m.remove(a, b)
+            elif op == 4:
+                r.update_many(batch)
+                for (a, b) in batch: m.add(a, b)
+            elif op == 5:
+                r.discard_many(batch)
+                for (a, b) in batch: m.remove(a, b)
+            elif op == 6:
+                r += range_t(set(batch))
+                for (a, b) in batch: m.add(a, b)
+            else:
+                r -= range_t(set(batch))
+                for (a, b) in batch: m.remove(a, b)
+
+            ctx = "iteration {}, step {}, op {}, state {}".format(it, step, op, sorted(r.toset()))
+
+            assert sorted(r.toset()) == m.subranges(), ctx
+            assert len(r) == sum(m.bits), ctx
+            assert r == range_t(set(m.subranges())), ctx
+
+            (a, b) = rand_range()
+            v = rnd.randrange(size)
+
+            assert r.contains((a, b)) == m.contains(a, b), ctx
+            assert r.contains(v) == m.contains(v, v + 1), ctx
+            assert ((a, b) in r) == m.holds(a, b), ctx
+            assert (v in r) == m.holds(v, v + 1), ctx
+            assert r.match((a, b)) == m.match(a, b), ctx
+            assert list(r.missing((a, b))) == m.missing(a, b), ctx
+            assert r.first_missing(v) == m.first_missing(v), ctx
+            assert r.contiguous(v) == m.first_missing(v) - v, ctx
+
+
+def sequential(size, chunk):
+
+    "``avail`` after sequential download of `size` bytes by `chunk` sized requests."
+
+    r = range_t()
+    for i in range(0, size, chunk):
+        r += (i, min(i + chunk, size))
+    return r
+
+
+def seeks(size, window, count, rnd):
+
+    "``avail`` after `count` random jumps, each one downloading `window` bytes."
+
+    r = range_t()
+    for _ in range(count):
+        p = rnd.randrange(size - window)
+        r += (p, p + window)
+    return r
+
+
+def holes(size, count):
+
+    "``avail`` with `count` evenly spread holes."
+
+    r = range_t()
+    step = size // count
+    r.update_many((i, i + step // 2) for i in range(0, size, step))
+    return r
+
+
+def measure(fn, probes):
+
+    """
+    Measure operations per second and peak memory allocated while running `fn` over `probes`.
+
+    Returns
+    -------
+    tuple
+        Operations per second and peak of memory allocated during the run (in bytes).
+    """
+
+    t = perf_counter()
+    for p in probes: fn(p)
+    elapsed = perf_counter() - t
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    for p in probes: fn(p)
+    peak = tracemalloc.get_traced_memory()[1] - base
+    tracemalloc.stop()
+
+    return (len(probes) / elapsed, peak)
+
+
+def bench(probe_count=2000, seed=0):
+
+    """
+    Time ``range_t`` operations over fragmentation patterns and print results.
+    """
+
+    rnd = random.Random(seed)
+
+    size = 1 << 30 # 1 GiB movie
+    read = 1 << 17 # 128 KiB player reads
+
+    patterns = [
+        ("sequential", sequential(size, 1 << 16)),
+        ("seeks", seeks(size, 1 << 20, 1000, rnd)),
+        ("holes", holes(size, 5000)),
+    ]
+
+    print("{:<12} {:>6} {:<14} {:>14} {:>12}".format("pattern", "subr", "operation", "ops/s", "peak B"))
+
+    for (name, r) in patterns:
+
+        probes = [rnd.randrange(size - read) for _ in range(probe_count)]
+        sub = len(r.toset())
+
+        def iadd(p, c=r + range_t()): # work on a copy, so r stays as it is.
+            c += (p, p + read)
+
+        def isub(p, c=r + range_t()):
+            c -= (p, p + read)
+
+        ops = [
+            ("contains", lambda p: r.contains((p, p + read))),
+            ("in", lambda p: (p, p + read) in r),
+            ("match", lambda p: r.match((p, p + read))),
+            ("+=", iadd),
+            ("-=", isub),
+            ("-", lambda p: r - (p, p + read)),
+            ("len", lambda p: len(r)),
+            ("missing", lambda p: [g for g in r.missing((p, p + read))]),
+            ("first_missing", lambda p: r.first_missing(p)),
+        ]
+
+        for (op, fn) in ops:
+            (ops_s, peak) = measure(fn, probes)
+            print("{:<12} {:>6} {:<14} {:>14,.0f} {:>12.0f}".format(name, sub, op, ops_s, peak))
+
+
+def main():
+
+    parser = ArgumentParser(description="range_t equivalence check and benchmark.")
+    parser.add_argument('--iterations', type=int, default=2000, help="Number of random equivalence check sequences.")
+    parser.add_argument('--no-bench', action='store_true', default=False, help="Only run the equivalence check.")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed.")
+    x = parser.parse_args()
+
+    check(x.iterations, seed=x.seed)
+    print("equivalence check: {} sequences OK".format(x.iterations))
+
+    if not x.no_bench:
+        bench(seed=x.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+
+"""
+Throughput benchmark of ``YTStor.read`` data paths. No FUSE mount nor network access is needed: a sparse file is
+filled with random data and read by several threads, each one reading its own region sequentially, as players do.
+Every read result is copied to a buffer with ``ctypes.memmove``, exactly like fusepy does with data returned from
+``read``, so measured time includes the copy to kernel buffer.
+
+Paths compared:
+
+``seek``
+    ``seek`` and ``read`` under a lock - how ``YTStor.read`` worked before positional I/O.
+``pread``
+    ``SparseStorage.pread`` - a new ``bytes`` object for every read.
+``mmap``
+    ``SparseStorage.view`` - slice of a memory map, no copy besides fusepy's ``memmove``.
+
+Run from repository root::
+
+    $ python3 bench/bench_read.py
+    $ python3 bench/bench_read.py --size 512M --threads 8 --read 128K
+"""
+
+import os
+import sys
+import tempfile
+from argparse import ArgumentParser
+from ctypes import create_string_buffer, memmove
+from threading import Thread, Lock
+from time import perf_counter
+
+# import modules directly, so neither FUSE nor other YTFS dependencies are needed.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "ytfs"))
+
+from storage import SparseStorage
+from units import size_arg
+
+
+def run(read, size, threads, length, rounds):
+
+    """
+    Read the whole file `rounds` times with `threads` threads and measure throughput.
+
+    Parameters
+    ----------
+    read : callable
+        Function of (offset, length), returning data in any form ``memmove`` accepts.
+    size : int
+        File size.
+    threads : int
+        Number of reading threads. Each one reads its own region.
+    length : int
+        Length of a single read.
+    rounds : int
+        How many times the file is read.
+
+    Returns
+    -------
+    float
+        Throughput in MiB/s.
+    """
+
+    region = size // threads // length * length
+
+    def worker(start):
+
+        buf = create_string_buffer(length) # kernel buffer given to fusepy.
+
+        for _ in range(rounds):
+            for offset in range(start, start + region, length):
+                ret = read(offset, length)
+                memmove(buf, ret, len(ret))
+
+    workers = [Thread(target=worker, args=(i * region,)) for i in range(threads)]
+
+    t = perf_counter()
+    for w in workers: w.start()
+    for w in workers: w.join()
+    elapsed = perf_counter() - t
+
+    return region * threads * rounds / elapsed / (1 << 20)
+
+
+def main():
+
+    parser = ArgumentParser(description="YTStor.read data paths throughput benchmark.")
+    parser.add_argument('--size', type=size_arg, default=256 << 20, help="File size. Default is 256M.")
+    parser.add_argument('--threads', type=int, default=4, help="Number of reading threads. Default is 4.")
+    parser.add_argument('--read', type=size_arg, default=128 << 10, help="Length of a single read. Default is 128K.")
+    parser.add_argument('--rounds', type=int, default=3, help="How many times the file is read. Default is 3.")
+    x = parser.parse_args()
+
+    with tempfile.TemporaryFile() as f:
+
+        storage = SparseStorage(f, x.size)
+
+        chunk = os.urandom(1 << 20)
+        for offset in range(0, x.size, len(chunk)):
+            storage.pwrite(offset, chunk[:x.size - offset])
+
+        lock = Lock()
+
+        def seek(offset, length):
+            with lock:
+                f.seek(offset)
+                return f.read(length)
+
+        paths = [
+            ("seek", seek),
+            ("pread", storage.pread),
+            ("mmap", storage.view),
+        ]
+
+        assert bytes(storage.view(12345, 100)) == storage.pread(12345, 100) == seek(12345, 100)
+
+        print("{} threads, {} B reads, {} MiB file".format(x.threads, x.read, x.size >> 20))
+        print("{:<8} {:>12}".format("path", "MiB/s"))
+
+        for (name, read) in paths:
+            run(read, x.size, x.threads, x.read, 1) # warm up page cache.
+            print("{:<8} {:>12,.0f}".format(name, run(read, x.size, x.threads, x.read, x.rounds)))
+
+        storage.close()
+
+
+if __name__ == "__main__":
+    main()
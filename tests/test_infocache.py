@@ -0,0 +1,43 @@
+"""
+Tests of ``ytfs.infocache``.
+"""
+
+from time import time
+
+from ytfs.infocache import InfoCache
+
+
+def url(expire):
+    return 'https://r1.googlevideo.com/videoplayback?expire={}'.format(int(expire))
+
+
+def test_expired_entries_are_pruned():
+
+    cache = InfoCache()
+
+    for i in range(100):
+        cache.store('old{}'.format(i), {'url': [url(time() - 1)]}, [url(time() - 1)])
+
+    cache.store('new', {'url': [url(time() + 7200)]}, [url(time() + 7200)])
+
+    assert list(cache.entries) == ['new']
+
+
+def test_stale_entry_is_dropped_on_lookup():
+
+    cache = InfoCache()
+    cache.store('soon', {'url': [url(time() + 60)]}, [url(time() + 60)]) # within margin.
+
+    assert cache.lookup('soon') is None
+    assert 'soon' not in cache.entries
+
+
+def test_stale_row_is_not_kept_in_memory(tmp_path):
+
+    path = str(tmp_path / 'info.db')
+
+    InfoCache(path).store('soon', {'url': [url(time() + 60)]}, [url(time() + 60)])
+    cache = InfoCache(path)
+
+    assert cache.lookup('soon') is None
+    assert 'soon' not in cache.entries
@@ -0,0 +1,187 @@
+"""
+Tests of ``ytfs.stor``. Network is replaced by a fake session, which serves a random blob and records requests.
+"""
+
+import os
+import threading
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+import pytest
+import requests
+
+from ytfs.stor import YTStor, Eviction, Downloader
+from ytfs.storage import MemoryBudget
+
+
+DATA = os.urandom(8 << 20)
+
+
+class FakeResponse():
+
+    def __init__(self, data, headers, status_code):
+
+        self.data = data
+        self.content = data
+        self.headers = headers
+        self.status_code = status_code
+
+    def iter_content(self, chunk_size):
+
+        for i in range(0, len(self.data), chunk_size):
+            yield self.data[i:i + chunk_size]
+
+    def close(self):
+        pass
+
+
+class FakeSession():
+
+    "Serves `DATA` under every url, honours ``Range`` headers and records requests."
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, url, headers=None, stream=False):
+
+        self.calls.append((url, headers))
+
+        r = (headers or {}).get('Range')
+
+        if not r:
+            return FakeResponse(DATA, {'content-length': str(len(DATA))}, 200)
+
+        (start, end) = r.split('=')[1].split('-')
+        start = int(start)
+        end = int(end) + 1 if end else len(DATA)
+        data = DATA[start:end]
+
+        return FakeResponse(data, {'content-length': str(len(data)),
+                'content-range': 'bytes {}-{}/{}'.format(start, start + len(data) - 1, len(DATA))}, 206)
+
+
+def stor(opts):
+
+    yts = YTStor({'yid': 'abcdefghijk'}, opts)
+    yts.r_session = FakeSession()
+    yts.url = 'http://example.com/videoplayback?itag=22'
+    yts.filesize = len(DATA)
+
+    return yts
+
+
+@pytest.fixture
+def keep_behind(monkeypatch):
+
+    monkeypatch.setitem(Eviction.preferences, 'keep', 1 << 20)
+    monkeypatch.setitem(Eviction.preferences, 'step', 1 << 20)
+    monkeypatch.setitem(MemoryBudget.preferences, 'size', 0) # data on disk, so it can be punched out.
+
+
+def test_preload_is_not_trimmed(keep_behind):
+
+    yts = stor({'stream': False})
+    yts.registerHandler(1)
+
+    assert (0, len(DATA)) in yts.avail
+    requests = len(yts.r_session.calls)
+
+    for offset in range(0, len(DATA), 1 << 17):
+        assert bytes(yts.read(offset, 1 << 17, 1)) == DATA[offset:offset + (1 << 17)]
+
+    assert bytes(yts.read(0, 1 << 17, 1)) == DATA[:1 << 17]
+
+    assert len(yts.r_session.calls) == requests # nothing downloaded again.
+    assert (0, len(DATA)) in yts.avail
+
+    yts.unregisterHandler(1)
+    yts.clean()
+
+
+def test_stream_is_trimmed(keep_behind):
+
+    yts = stor({'stream': True})
+    yts.registerHandler(1)
+
+    for offset in range(0, len(DATA), 1 << 17):
+        assert bytes(yts.read(offset, 1 << 17, 1)) == DATA[offset:offset + (1 << 17)]
+
+    if yts.data.can_punch():
+        assert (0, 1 << 20) not in yts.avail
+
+    assert bytes(yts.read(0, 1 << 17, 1)) == DATA[:1 << 17] # downloaded again.
+
+    yts.unregisterHandler(1)
+    yts.clean()
+
+
+class Handler(BaseHTTPRequestHandler):
+
+    "Serves `DATA` over keep-alive connections; under ``/nohead`` HEAD gives no size. Counts connections."
+
+    protocol_version = 'HTTP/1.1'
+    connections = 0
+
+    def setup(self):
+
+        Handler.connections += 1
+        super().setup()
+
+    def log_message(self, *args):
+        pass
+
+    def do_HEAD(self):
+
+        self.send_response(200)
+
+        if self.path != '/nohead':
+            self.send_header('Content-Length', str(len(DATA)))
+        else:
+            self.send_header('Content-Length', '0')
+
+        self.end_headers()
+
+    def do_GET(self):
+
+        (start, end) = self.headers['Range'].split('=')[1].split('-')
+        data = DATA[int(start):int(end) + 1]
+
+        self.send_response(206)
+        self.send_header('Content-Range', 'bytes {}-{}/{}'.format(start, int(start) + len(data) - 1, len(DATA)))
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def server():
+
+    Handler.connections = 0
+    srv = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+
+    yield 'http://127.0.0.1:{}'.format(srv.server_address[1])
+
+    srv.shutdown()
+    srv.server_close()
+
+
+@pytest.mark.parametrize('path', ['/', '/nohead'])
+def test_probe_reuses_connection(server, path):
+
+    session = requests.Session()
+
+    for _ in range(5):
+        assert Downloader.probe(session, server + path) == len(DATA)
+
+    pools = session.get_adapter(server).poolmanager.pools
+    connections = sum(pools[key].num_connections for key in pools.keys())
+
+    session.close()
+
+    assert connections == 1
+    assert Handler.connections == 1
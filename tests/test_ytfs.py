@@ -0,0 +1,68 @@
+"""
+Tests of ``ytfs.ytfs``. Filesystem operations are called directly, as FUSE would call them.
+"""
+
+import os
+from ctypes import pointer
+
+from fuse import fuse_file_info
+
+from ytfs.ytfs import YTFS, FUSE
+from ytfs.stor import YTMetaStor, SharedSession
+
+
+JPEG = os.urandom(20000)
+
+
+class FakeResponse():
+
+    content = JPEG
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession():
+
+    def get(self, url):
+        return FakeResponse()
+
+
+def mount(fs):
+
+    "FUSE object which only dispatches calls to `fs`, without mounting it."
+
+    fuse = FUSE.__new__(FUSE)
+    fuse.operations = fs
+    fuse.raw_fi = False
+    fuse.encoding = 'utf-8'
+
+    return fuse
+
+
+def test_thumbnail_is_read_whole(monkeypatch):
+
+    monkeypatch.setattr(SharedSession, 'get', lambda: FakeSession())
+
+    fs = YTFS()
+    fs.searches['cats'] = {'cat': YTMetaStor({'url': 'https://i.ytimg.com/vi/abcdefghijk/hqdefault.jpg'}),
+            'cat desc': YTMetaStor({'title': 'cat', 'yid': 'abcdefghijk', 'desc': '', 'channel': 'cats',
+                'pub_date': '2016-01-01T00:00:00.000Z'})}
+
+    assert fs.getattr('/cats/cat')['st_size'] == 4096 # listing doesn't download thumbnails.
+
+    fi = fuse_file_info()
+    fi.flags = os.O_RDONLY
+
+    assert mount(fs).open(b'/cats/cat', pointer(fi)) == 0
+    assert fi.direct_io # kernel doesn't cut reads at 4096.
+    assert fs.read('/cats/cat', 65536, 0, fi.fh) == JPEG
+
+    fi = fuse_file_info()
+    fi.flags = os.O_RDONLY
+
+    assert mount(fs).open(b'/cats/cat desc', pointer(fi)) == 0
+    assert not fi.direct_io # size of descriptions is known.
+
+    for meta in fs.searches['cats'].values():
+        meta.clean()
@@ -5,11 +5,14 @@ Module responsible for searching movies in Internet services. As for now only Yo
 import os
 import requests
 
-from .stor import YTStor, YTMetaStor
+from .stor import YTEntry, YTMetaStor
+from .session import SharedSession
 
 from copy import copy, deepcopy
 from collections import OrderedDict
 from urllib.parse import urlencode
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor
 
 class YTActions():
 
@@ -29,7 +32,7 @@ class YTActions():
         `adj_tokens` contains adjacent tokens, `files` contains files of given search.
         (just as described below).
     visible_files : dict
-        Current search results. Key is a movie name, value is a ``YTStor`` object for given movie.
+        Current search results. Key is a movie name, value is a ``YTEntry`` object for given movie.
     adj_tokens : dict
         Dictionary of tokens for adjacent search pages. Under ``False`` key the previous page is kept, under ``True`` -
         the next. Other keys are not allowed.
@@ -43,7 +46,10 @@ class YTActions():
     api_key : str
         YouTube API key.
     preferences : dict
-        Current object preferences.
+        Current object preferences. ``warmup`` - number of threads which obtain information about search results in
+        background, ``0`` disables it.
+    warming : list
+        Background tasks of current page warm-up.
 
     Parameters
     ----------
@@ -57,9 +63,13 @@ class YTActions():
         "metadata": {
             "desc": False,
             "thumb": False
-        }
+        },
+        "warmup": 0
     }
 
+    __warmup_pool = None
+    __warmup_lock = Lock()
+
     def __init__(self, search_query):
 
         if not isinstance(search_query, str):
@@ -70,6 +80,7 @@ class YTActions():
 
         self.avail_files = OrderedDict()
         self.visible_files = None
+        self.warming = []
         self.adj_tokens = {False: None, True: None}
 
         self.vf_iter = None
@@ -124,7 +135,7 @@ class YTActions():
 
         api_fixed_url = "https://www.googleapis.com/youtube/v3/channels?part=id&maxResults=1&fields=items%2Fid&"
         url = api_fixed_url + urlencode({"key": self.api_key, "forUsername": self.search_params["channelId"]})
-        get = requests.get(url).json()
+        get = SharedSession.get().get(url).json()
 
         try:
             self.search_params["channelId"] = get['items'][0]['id']
@@ -135,7 +146,7 @@ class YTActions():
 
         api_fixed_url = "https://www.googleapis.com/youtube/v3/search?part=snippet&type=channel&fields=items%2Fid&"
         url = api_fixed_url + urlencode({"key": self.api_key, "q": self.search_params['channelId']})
-        get = requests.get(url).json()
+        get = SharedSession.get().get(url).json()
 
         try:
             self.search_params["channelId"] = get['items'][0]['id']['channelId']
@@ -302,7 +313,7 @@ class YTActions():
         url = api_fixed_url + urlencode(d)
 
         try:
-            get = requests.get(url)
+            get = SharedSession.get().get(url)
         except requests.exceptions.ConnectionError:
             raise ConnectionError
 
@@ -401,7 +412,7 @@ class YTActions():
 
         # this choses data we need.
         files = lambda x: {
-            i['snippet']['title'].replace('/', '\\'): YTStor(
+            i['snippet']['title'].replace('/', '\\'): YTEntry(
                 {'yid': i['id']['videoId'], 'pub_date': i['snippet']['publishedAt']},
                 opts=self.yts_opts) for i in x['items']
         }
@@ -419,7 +430,8 @@ class YTActions():
         }
         thumbs = lambda x: {
             (i['snippet']['title'].replace('/', '\\') + '.jpg'): YTMetaStor(
-                {'url': i['snippet']['thumbnails']['high']['url'], 'pub_date': i['snippet']['publishedAt']}, opts=dict()
+                {'url': i['snippet']['thumbnails']['high']['url'], 'pub_date': i['snippet']['publishedAt'],
+                    'yid': i['id']['videoId']}, opts=dict()
             ) for i in x['items']
         }
 
@@ -453,7 +465,10 @@ class YTActions():
         if len(self.avail_files) > 4:
 
             pop = self.avail_files.popitem(False) # get rid of the oldest data.
-            for s in pop[1][1].values(): s.clean()
+
+            # page may be still in use - objects are shared, so every page has to be cleaned exactly once.
+            if pop[1][1] is not self.visible_files and all(pop[1][1] is not p[1] for p in self.avail_files.values()):
+                for s in pop[1][1].values(): s.clean()
 
         adj_t = deepcopy(self.adj_tokens) # this will we write to avail_files, now we update self.adj_tokens.
 
@@ -477,11 +492,40 @@ class YTActions():
 
         self.visible_files = data[1]
 
+        self.__warmup()
+
+    def __warmup(self):
+
+        """
+        Obtain information about visible movies and download thumbnails in background (see ``YTEntry.warm`` and
+        ``YTMetaStor.warm``), so ``getattr`` returns real sizes and first ``open`` is fast. Tasks are run by a
+        process-wide pool of ``warmup`` threads. Tasks of the previous page which haven't started yet are cancelled.
+        """
+
+        for f in self.warming:
+            f.cancel()
+
+        self.warming = []
+
+        if not self.preferences['warmup']:
+            return
+
+        with YTActions.__warmup_lock:
+
+            if YTActions.__warmup_pool is None:
+                YTActions.__warmup_pool = ThreadPoolExecutor(max_workers=self.preferences['warmup'])
+
+        self.warming = [YTActions.__warmup_pool.submit(e.warm) for e in self.visible_files.values()
+                if isinstance(e, YTEntry) or (isinstance(e, YTMetaStor) and e.url is not None)]
+
     def clean(self):
 
         """Clear the data. For each ``YTStor`` object present in this object ``clean`` method is executed."""
 
-        for s in self.visible_files.values():
+        for f in self.warming:
+            f.cancel()
+
+        pages = {id(p): p for p in [self.visible_files] + [sub[1] for sub in self.avail_files.values()] if p is not None}
+
+        for s in [p[x] for p in pages.values() for x in p]: # every page once - objects are shared between pages.
             s.clean()
-        for s in [sub[1][x] for sub in self.avail_files.values() for x in sub[1]]: # Double list comprehensions aren't very
-            s.clean()                                                        # readable...
@@ -0,0 +1,475 @@
+"""
+Module that provides persistent caches of downloaded movie data and metadata, which survive unmounting.
+"""
+
+import os
+import json
+import fcntl
+from time import time
+from threading import Lock
+
+from .range_t import range_t
+from .storage import SparseStorage
+
+class BlockCache():
+
+    """
+    Persistent cache of movie data. Every entry is identified by a key (YouTube id and chosen format) and consists of
+    two files in cache directory:
+
+    ``<key>.data``
+        Sparse file with movie data, written in place by ``YTStor`` as data is downloaded.
+    ``<key>.idx``
+        JSON index: file size and list of downloaded ranges (serialized ``range_t``).
+
+    Index is replaced atomically and only after data it describes is synced to disk, so after a crash an entry may
+    lack some data it has, but never claims data it doesn't have. Total size of entries is kept below ``size`` bytes;
+    least recently used entries are evicted first, entries in use are never evicted.
+
+    An entry is used by one ``YTStor`` at a time: its index describes data written by that object only, so two objects
+    writing one file (e.g. two searches with different ``format`` that chose the same ``itag``) would truncate or
+    punch out each other's data. Entry in use can't be opened again. Data file of an entry in use is locked with
+    ``flock``, so this holds also for other mounts sharing the cache directory; they don't evict it either.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``path`` - cache directory, ``None`` disables the cache; ``size`` - cache size budget in bytes;
+        ``commit_interval`` - minimum number of seconds between index updates of an entry during download.
+    lock : Lock
+        Guards cache state.
+    used : set
+        Keys of entries in use.
+    commits : dict
+        Time of the last index update of every entry in use.
+    """
+
+    preferences = {
+        "path": None,
+        "size": 10 << 30, # 10 GiB
+        "commit_interval": 5
+    }
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the cache. It is created on first use, with preferences set at that moment.
+
+        Returns
+        -------
+        BlockCache or None
+            The cache or ``None``, if caching is disabled.
+        """
+
+        if not cls.preferences['path']:
+            return None
+
+        with cls.__instance_lock:
+
+            if cls.__instance is None:
+                cls.__instance = cls(cls.preferences['path'])
+
+            return cls.__instance
+
+    def __init__(self, path):
+
+        self.path = path
+        self.lock = Lock()
+        self.used = set()
+        self.commits = dict()
+
+        os.makedirs(path, exist_ok=True)
+
+    def __files(self, key):
+
+        """
+        Paths of entry files.
+
+        Parameters
+        ----------
+        key : str
+            Entry key.
+
+        Returns
+        -------
+        tuple
+            Data file path and index file path.
+        """
+
+        base = os.path.join(self.path, key)
+        return (base + ".data", base + ".idx")
+
+    def open(self, key, filesize=None):
+
+        """
+        Open cache entry, create it if it doesn't exist. Entry is marked as used until ``close``; meanwhile it can't
+        be opened again.
+
+        Parameters
+        ----------
+        key : str
+            Entry key. Must be a valid file name.
+        filesize : int or None, optional
+            Expected file size. If entry was saved with a different size, its contents are dropped. ``None`` if size is
+            not known yet.
+
+        Returns
+        -------
+        tuple or None
+            ``SparseStorage`` on data file, ``range_t`` of data present in it, and file size saved in index (``None``
+            if not known); ``None`` if the entry is in use.
+        """
+
+        (data, idx) = self.__files(key)
+
+        with self.lock:
+
+            if key in self.used:
+                return None
+
+            f = open(data, 'r+b' if os.path.exists(data) else 'w+b')
+
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB) # another mount may use it.
+            except BlockingIOError:
+                f.close()
+                return None
+            except OSError:
+                pass # no locks on this filesystem.
+
+            self.used.add(key) # claimed before index is read, so nobody writes data it describes.
+            self.commits[key] = 0
+
+        avail = range_t()
+        size = None
+
+        try:
+            with open(idx) as i:
+                index = json.load(i)
+
+            size = index['filesize']
+            avail.update_many(tuple(r) for r in index['avail'])
+
+        except (OSError, ValueError, KeyError, TypeError):
+            avail = range_t() # no entry or broken index - start from scratch.
+            size = None
+
+        if filesize is not None and size is not None and size != filesize:
+            avail = range_t()
+            size = None
+
+        with self.lock:
+
+            if not avail: # nothing valid there, start with an empty (sparse) file.
+                f.truncate(0)
+
+            try:
+                os.utime(idx) # mark as recently used.
+            except OSError:
+                pass
+
+        self.evict()
+
+        return (SparseStorage(f, filesize), avail, size if size is not None else filesize)
+
+    def commit(self, key, storage, avail, filesize, lock, force=False):
+
+        """
+        Save index of an entry. Data file is synced first, so index never describes data which isn't on disk.
+
+        Parameters
+        ----------
+        key : str
+            Entry key.
+        storage : SparseStorage
+            Entry data.
+        avail : range_t
+            Data present in `storage`. Data has to be written before it's marked as available.
+        filesize : int
+            File size.
+        lock : Lock
+            Lock that guards `avail`; it is held only while it's snapshotted.
+        force : bool, optional
+            If ``False``, index is not updated more often than every ``commit_interval`` seconds.
+        """
+
+        now = time()
+
+        with self.lock:
+
+            if not force and now - self.commits.get(key, 0) < self.preferences['commit_interval']:
+                return
+
+            self.commits[key] = now
+
+        with lock:
+            ranges = sorted(avail.toset())
+
+        if not storage.sync(): # everything written before the snapshot is on disk now.
+            return
+
+        idx = self.__files(key)[1]
+        tmp = idx + ".tmp"
+
+        with open(tmp, 'w') as t:
+            json.dump({"filesize": filesize, "avail": ranges}, t)
+            t.flush()
+            os.fsync(t.fileno())
+
+        os.replace(tmp, idx)
+
+    def close(self, key):
+
+        """
+        Mark entry as no longer used.
+
+        Parameters
+        ----------
+        key : str
+            Entry key.
+        """
+
+        with self.lock:
+
+            self.used.discard(key)
+            self.commits.pop(key, None)
+
+        self.evict()
+
+    def evict(self):
+
+        """
+        Remove least recently used entries, until cache size fits in the budget.
+        """
+
+        with self.lock:
+
+            entries = []
+            total = 0
+
+            for name in os.listdir(self.path):
+
+                if not name.endswith(".data"):
+                    continue
+
+                key = name[:-5]
+                (data, idx) = self.__files(key)
+
+                try:
+                    size = os.stat(data).st_blocks * 512 # real disk usage of a sparse file.
+                except OSError:
+                    continue
+
+                try:
+                    stamp = os.stat(idx).st_mtime
+                except OSError:
+                    stamp = 0
+
+                total += size
+                entries.append((stamp, key, size))
+
+            for (stamp, key, size) in sorted(entries):
+
+                if total <= self.preferences['size']:
+                    break
+
+                if key in self.used:
+                    continue
+
+                try:
+                    f = open(data, 'rb')
+                except OSError:
+                    continue
+
+                with f:
+
+                    try:
+                        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue # used by another mount.
+                    except OSError:
+                        pass
+
+                    for p in self.__files(key):
+                        try:
+                            os.remove(p)
+                        except OSError:
+                            pass
+
+                total -= size
+
+
+class MetaCache():
+
+    """
+    Persistent cache of small metadata files, e.g. thumbnails. Every file is kept whole in cache directory, under a
+    name derived from YouTube id, so a movie which appears in many searches has its metadata downloaded once, also
+    across mounts. Total size of files is kept below ``size`` bytes; least recently used files are removed first.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``path`` - cache directory, ``None`` disables the cache; ``size`` - cache size budget in bytes.
+    lock : Lock
+        Guards eviction.
+    """
+
+    preferences = {
+        "path": None,
+        "size": 1 << 26 # 64 MiB
+    }
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the cache. It is created on first use, with preferences set at that moment.
+
+        Returns
+        -------
+        MetaCache or None
+            The cache or ``None``, if caching is disabled.
+        """
+
+        if not cls.preferences['path']:
+            return None
+
+        with cls.__instance_lock:
+
+            if cls.__instance is None:
+                cls.__instance = cls(cls.preferences['path'])
+
+            return cls.__instance
+
+    def __init__(self, path):
+
+        self.path = path
+        self.lock = Lock()
+
+        os.makedirs(path, exist_ok=True)
+
+    def size(self, name):
+
+        """
+        Get size of a cached file, without reading it.
+
+        Parameters
+        ----------
+        name : str
+            File name. Must be a valid file name.
+
+        Returns
+        -------
+        int or None
+            File size, ``None`` if file isn't cached.
+        """
+
+        try:
+            return os.stat(os.path.join(self.path, name)).st_size
+        except OSError:
+            return None
+
+    def load(self, name):
+
+        """
+        Read a cached file and mark it as recently used.
+
+        Parameters
+        ----------
+        name : str
+            File name.
+
+        Returns
+        -------
+        bytes or None
+            File contents, ``None`` if file isn't cached.
+        """
+
+        p = os.path.join(self.path, name)
+
+        try:
+            with open(p, 'rb') as f:
+                data = f.read()
+
+            os.utime(p)
+
+        except OSError:
+            return None
+
+        return data
+
+    def store(self, name, data):
+
+        """
+        Put a file in the cache. File is replaced atomically, so readers never see it partially written. Cache is
+        best effort, so failures are ignored.
+
+        Parameters
+        ----------
+        name : str
+            File name.
+        data : bytes
+            File contents.
+        """
+
+        p = os.path.join(self.path, name)
+        tmp = "{}.{}.tmp".format(p, id(data))
+
+        try:
+            with open(tmp, 'wb') as f:
+                f.write(data)
+
+            os.replace(tmp, p)
+
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+            return
+
+        self.evict()
+
+    def evict(self):
+
+        """
+        Remove least recently used files, until cache size fits in the budget.
+        """
+
+        with self.lock:
+
+            entries = []
+            total = 0
+
+            for name in os.listdir(self.path):
+
+                if name.endswith(".tmp"):
+                    continue
+
+                try:
+                    st = os.stat(os.path.join(self.path, name))
+                except OSError:
+                    continue
+
+                total += st.st_size
+                entries.append((st.st_mtime, name, st.st_size))
+
+            for (stamp, name, size) in sorted(entries):
+
+                if total <= self.preferences['size']:
+                    break
+
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+
+                total -= size
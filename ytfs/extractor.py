@@ -0,0 +1,149 @@
+"""
+Module that provides shared access to youtube_dl, used for extracting information about movies.
+"""
+
+import queue
+import youtube_dl
+from threading import Lock, BoundedSemaphore
+from contextlib import contextmanager
+
+class ExtractorPool():
+
+    """
+    Process-wide pool of ``YoutubeDL`` instances. ``YoutubeDL`` object can't be used by two threads at once, and
+    creating one (with its Youtube extractor) is costly, so instead of every ``YTStor`` having its own, instances are
+    created on demand - no more than ``size`` of them - and reused. The most recently used instance is reused first, so
+    extractor-level caches (e.g. player code used for deciphering signatures) stay warm between movies.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``size`` - maximum number of instances, i.e. maximum number of concurrent extractions.
+    slots : BoundedSemaphore
+        Limits number of instances in use.
+    idle : LifoQueue
+        Instances not in use at the moment.
+    lock : Lock
+        Guards ``created``.
+    created : int
+        Number of instances created so far.
+    """
+
+    preferences = {
+        "size": 4
+    }
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the pool. It is created on first use, with preferences set at that moment.
+
+        Returns
+        -------
+        ExtractorPool
+            The pool.
+        """
+
+        with cls.__instance_lock:
+
+            if cls.__instance is None:
+                cls.__instance = cls()
+
+            return cls.__instance
+
+    def __init__(self):
+
+        self.slots = BoundedSemaphore(self.preferences['size'])
+        self.idle = queue.LifoQueue()
+        self.lock = Lock()
+        self.created = 0
+
+    def __create(self):
+
+        """
+        Create new ``YoutubeDL`` instance.
+
+        Returns
+        -------
+        YoutubeDL
+            New instance.
+        """
+
+        ytdl = youtube_dl.YoutubeDL({"quiet": True, "format": "bestvideo+bestaudio"})
+        ytdl.add_info_extractor( ytdl.get_info_extractor("Youtube"))
+
+        with self.lock:
+            self.created += 1
+
+        return ytdl
+
+    @contextmanager
+    def borrow(self):
+
+        """
+        Borrow an instance for exclusive use. Waits, if all ``size`` instances are in use.
+
+        Yields
+        ------
+        YoutubeDL
+            Instance, returned to the pool on exit from ``with`` block.
+        """
+
+        self.slots.acquire()
+
+        try:
+            try:
+                ytdl = self.idle.get_nowait()
+            except queue.Empty:
+                ytdl = self.__create()
+
+            try:
+                yield ytdl
+            finally:
+                self.idle.put(ytdl)
+
+        finally:
+            self.slots.release()
+
+    def extract(self, yid):
+
+        """
+        Extract information about a movie.
+
+        Parameters
+        ----------
+        yid : str
+            YouTube video id.
+
+        Returns
+        -------
+        dict
+            Information returned by ``YoutubeDL.extract_info``.
+
+        Raises
+        ------
+        youtube_dl.utils.DownloadError
+            When extraction fails.
+        """
+
+        with self.borrow() as ytdl:
+            return ytdl.extract_info(yid, download=False)
+
+    def stats(self):
+
+        """
+        Pool statistics.
+
+        Returns
+        -------
+        dict
+            ``size`` - maximum number of instances, ``created`` - number of instances created, ``idle`` - number of
+            instances not in use.
+        """
+
+        with self.lock:
+            return {"size": self.preferences['size'], "created": self.created, "idle": self.idle.qsize()}
@@ -0,0 +1,254 @@
+"""
+Module that provides cache of information extracted about movies.
+"""
+
+import os
+import json
+import sqlite3
+from time import time
+from threading import Lock
+from urllib.parse import urlparse, parse_qs
+
+class InfoCache():
+
+    """
+    Cache of information extracted about movies: chosen url(s), file size and duration. Extraction is a few round
+    trips to YouTube, while players and file managers open the same file many times, so information is reused until
+    urls are about to expire. Information is kept in memory and, if ``path`` is set, in SQLite database, so it
+    survives remounting.
+
+    Expiry time is read from ``expire`` parameter of googlevideo urls; if it's not there, information is kept for
+    ``ttl`` seconds. Information about one movie is extracted by one thread at a time (see ``obtain``), others wait
+    for it.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``path`` - database file, ``None`` keeps information only in memory; ``margin`` - how many seconds before
+        expiry information is considered stale; ``ttl`` - how long information is valid if urls don't say.
+    lock : Lock
+        Guards ``entries``, ``pending`` and database connection.
+    entries : dict
+        Information kept in memory: tuples of (information, expiry time). Stale information is removed when it's
+        looked up, expired one whenever new information is stored.
+    pending : dict
+        Locks of keys being obtained at the moment, with number of threads using them.
+    db : sqlite3.Connection or None
+        Database connection.
+    """
+
+    preferences = {
+        "path": None,
+        "margin": 600,
+        "ttl": 3600
+    }
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the cache. It is created on first use, with preferences set at that moment.
+
+        Returns
+        -------
+        InfoCache
+            The cache.
+        """
+
+        with cls.__instance_lock:
+
+            if cls.__instance is None:
+                cls.__instance = cls(cls.preferences['path'])
+
+            return cls.__instance
+
+    def __init__(self, path=None):
+
+        self.lock = Lock()
+        self.entries = dict()
+        self.pending = dict()
+        self.db = None
+
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self.db = sqlite3.connect(path, check_same_thread=False) # used only with self.lock held.
+                self.db.execute("CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, value TEXT, expire REAL)")
+                self.db.execute("DELETE FROM info WHERE expire < ?", (time(),))
+                self.db.commit()
+
+            except (OSError, sqlite3.Error):
+                self.db = None # memory is enough.
+
+    def expiry(self, urls):
+
+        """
+        Find when urls expire.
+
+        Parameters
+        ----------
+        urls : iterable
+            Urls.
+
+        Returns
+        -------
+        float
+            Expiry time (Unix timestamp) of the earliest expiring url.
+        """
+
+        ret = time() + self.preferences['ttl']
+
+        for u in urls:
+            try:
+                ret = min(ret, float(parse_qs(urlparse(u).query)['expire'][0]))
+            except (KeyError, ValueError):
+                pass
+
+        return ret
+
+    def lookup(self, key):
+
+        """
+        Get information, if it's fresh.
+
+        Parameters
+        ----------
+        key : str
+            Movie key.
+
+        Returns
+        -------
+        dict or None
+            Information, ``None`` if there's none or it expires soon.
+        """
+
+        deadline = time() + self.preferences['margin']
+
+        with self.lock:
+
+            (info, expire) = self.entries.get(key, (None, 0))
+
+            if info is None and self.db is not None:
+                try:
+                    row = self.db.execute("SELECT value, expire FROM info WHERE key = ?", (key,)).fetchone()
+                except sqlite3.Error:
+                    row = None
+
+                if row is not None:
+                    (info, expire) = (json.loads(row[0]), row[1])
+
+                    if expire >= deadline:
+                        self.entries[key] = (info, expire)
+
+            if info is None or expire < deadline:
+                self.entries.pop(key, None) # will be obtained again.
+                return None
+
+            return info
+
+    def obtain(self, key, extract):
+
+        """
+        Get information; if it's not fresh, obtain it with `extract` and store it. Only one thread extracts information
+        for a key, others wait for it and use its result.
+
+        Parameters
+        ----------
+        key : str
+            Movie key.
+        extract : callable
+            Function without arguments, which returns information: a dict with list of urls under ``url``.
+
+        Returns
+        -------
+        dict
+            Information.
+        """
+
+        info = self.lookup(key)
+
+        if info is not None:
+            return info
+
+        with self.lock:
+            (lock, users) = self.pending.get(key, (Lock(), 0))
+            self.pending[key] = (lock, users + 1)
+
+        try:
+            with lock:
+
+                info = self.lookup(key) # maybe obtained while we waited.
+
+                if info is None:
+                    info = extract()
+                    self.store(key, info, info['url'])
+
+        finally:
+            with self.lock:
+
+                (lock, users) = self.pending[key]
+
+                if users > 1:
+                    self.pending[key] = (lock, users - 1)
+                else:
+                    del self.pending[key]
+
+        return info
+
+    def store(self, key, info, urls):
+
+        """
+        Put information in the cache.
+
+        Parameters
+        ----------
+        key : str
+            Movie key.
+        info : dict
+            Information; has to be serializable to JSON.
+        urls : iterable
+            Urls which information contains, used to find expiry time.
+        """
+
+        now = time()
+        expire = self.expiry(urls)
+
+        with self.lock:
+
+            for k in [k for (k, (_, e)) in self.entries.items() if e < now]:
+                del self.entries[k]
+
+            self.entries[key] = (info, expire)
+
+            if self.db is not None:
+                try:
+                    self.db.execute("DELETE FROM info WHERE expire < ?", (now,))
+                    self.db.execute("INSERT OR REPLACE INTO info VALUES (?, ?, ?)", (key, json.dumps(info), expire))
+                    self.db.commit()
+                except sqlite3.Error:
+                    pass
+
+    def drop(self, key):
+
+        """
+        Remove information, e.g. because its urls turned out to be expired earlier than they said.
+
+        Parameters
+        ----------
+        key : str
+            Movie key.
+        """
+
+        with self.lock:
+
+            self.entries.pop(key, None)
+
+            if self.db is not None:
+                try:
+                    self.db.execute("DELETE FROM info WHERE key = ?", (key,))
+                    self.db.commit()
+                except sqlite3.Error:
+                    pass
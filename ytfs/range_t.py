@@ -2,7 +2,7 @@
 Module that provides range_t class which offers a simple and compact way of representing number sets.
 """
 
-from copy import deepcopy
+from bisect import bisect_left, bisect_right
 
 class range_t():
 
@@ -11,10 +11,17 @@ class range_t():
     Subranges are represented as two element tuples, where first element is a left boundary and second element is a
     right range boundary. The left one is always included, whereas right is always excluded from the range.
 
+    Internally subranges are kept merged (no two of them overlap or touch) in two sorted lists of boundaries, so every
+    lookup is a binary search instead of a scan over all subranges.
+
     Attributes
     ----------
-    __has : set
-        Set of subranges.
+    __starts : list
+        Sorted left boundaries of subranges.
+    __ends : list
+        Sorted right boundaries of subranges. ``(__starts[i], __ends[i])`` is the i-th subrange.
+    __len : int
+        Sum of subranges lengths, kept up to date by every modification.
 
     Parameters
     ----------
@@ -24,7 +31,9 @@ class range_t():
 
     def __init__(self, initset=set()):
 
-        self.__has = set()
+        self.__starts = []
+        self.__ends = []
+        self.__len = 0
 
         if not isinstance(initset, set):
             raise TypeError("Expected set of tuples")
@@ -33,51 +42,135 @@ class range_t():
             if not isinstance(t, tuple) or len(t) != 2 or t[1] <= t[0] or t[1] < 0:
                 raise ValueError("Your tuples are wrong :(")
 
-        self.__has = initset
-        self.__optimize()
+        for t in sorted(initset):
+            self.__insert(t[0], t[1])
 
-    def __match_l(self, k, _set):
+    def __span(self, start, end):
 
         """
-        Method for searching subranges from `_set` that overlap on `k` range.
+        Find indices of subranges which overlap on ``[start, end]`` range. Subrange which begins exactly at `end` is
+        also taken into account.
 
         Parameters
         ----------
-        k : tuple or list or range
-            Range for which we search overlapping subranges from `_set`.
-        _set : set
-            Subranges set.
+        start : int
+            Left boundary.
+        end : int
+            Right boundary.
 
         Returns
         -------
-        matched : set
-            Set of subranges from `_set` that overlaps on `k`.
+        tuple
+            Pair ``(lo, hi)``; subranges of indices from ``lo`` up to ``hi - 1`` overlap on given range.
         """
 
-        return {r for r in _set if k[0] in range(*r) or k[1] in range(*r) or (k[0] < r[0] and k[1] >= r[1])}
-                                   #k partially or wholly in r               #r is wholly contained by k
-    def __optimize(self):
+        return (bisect_right(self.__ends, start), bisect_right(self.__starts, end))
+
+    def __insert(self, start, end):
 
         """
-        Merge overlapping or contacting subranges from ``self.__has`` attribute and update it. Called from all methods
-        that modify object contents.
+        Add ``[start, end)`` range and merge it with every overlapping or contacting subrange.
+
+        Parameters
+        ----------
+        start : int
+            Left boundary.
+        end : int
+            Right boundary.
+        """
+
+        lo = bisect_left(self.__ends, start) # first subrange that ends at or after start - it may be merged.
+        hi = bisect_right(self.__starts, end) # first subrange that starts after end - it stays untouched.
+
+        if lo == hi: # nothing to merge with.
+            self.__starts.insert(lo, start)
+            self.__ends.insert(lo, end)
+            self.__len += end - start
+            return
+
+        if self.__starts[lo] < start: start = self.__starts[lo]
+        if self.__ends[hi - 1] > end: end = self.__ends[hi - 1]
+
+        for i in range(lo, hi):
+            self.__len -= self.__ends[i] - self.__starts[i]
+
+        # reuse the first merged slot and drop the rest, so no new lists are created.
+        self.__starts[lo] = start
+        self.__ends[lo] = end
+        del self.__starts[lo + 1:hi]
+        del self.__ends[lo + 1:hi]
+
+        self.__len += end - start
+
+    def __remove(self, start, end):
 
-        Returns
-        -------
-        None
-            Method does not return. It does internal modifications on ``self.__has`` attribute.
         """
+        Remove ``[start, end)`` range. Subranges that collide with it are cut.
+
+        Parameters
+        ----------
+        start : int
+            Left boundary.
+        end : int
+            Right boundary.
+        """
+
+        lo = bisect_right(self.__ends, start) # first subrange that ends after start.
+        hi = bisect_left(self.__starts, end) # first subrange that starts at or after end.
 
-        ret = []
+        if lo == hi: # no collisions - nothing to substract.
+            return
 
-        for (begin, end) in sorted(self.__has):
+        left = self.__starts[lo]
+        right = self.__ends[hi - 1]
 
-            if ret and begin <= ret[-1][1] < end: # when current range overlaps with the last one from ret
-                ret[-1] = (ret[-1][0], end)
-            elif not ret or begin > ret[-1][1]:
-                ret.append( (begin, end) )
+        for i in range(lo, hi):
+            self.__len -= self.__ends[i] - self.__starts[i]
 
-        self.__has = set(ret)
+        # we get two, one or zero "new" subranges. They are written over colliding ones.
+        i = lo
+
+        if left < start:
+            self.__ends[i] = start
+            self.__len += start - left
+            i += 1
+
+        if right > end:
+
+            if i < hi:
+                self.__starts[i] = end
+                self.__ends[i] = right
+            else: # one subrange is split in two.
+                self.__starts.insert(i, end)
+                self.__ends.insert(i, right)
+                hi += 1
+
+            self.__len += right - end
+            i += 1
+
+        del self.__starts[i:hi]
+        del self.__ends[i:hi]
+
+    def __pairs(self, vals):
+
+        """
+        Convert many values to a sorted list of range tuples.
+
+        Parameters
+        ----------
+        vals : iterable or range_t
+            Integers or ranges, or ``range_t`` object.
+
+        Returns
+        -------
+        list
+            Sorted list of range tuples.
+        """
+
+        if isinstance(vals, range_t):
+            return list(zip(vals.__starts, vals.__ends)) # already sorted.
+
+        return sorted(tuple(self.__val_convert(v)) for v in vals)
 
     def __val_convert(self, val): # maybe I should make a decorator from this.
 
@@ -133,10 +226,12 @@ class range_t():
 
         (start, end) = self.__val_convert(val) # conversion
 
+        lo = bisect_right(self.__ends, start)
+        hi = bisect_left(self.__starts, end)
+
         retlen = 0
-        for r in self.__has:
-            if start < r[1] and end > r[0]:
-                retlen += ((end < r[1] and end) or r[1]) - ((start > r[0] and start) or r[0])
+        for i in range(lo, hi):
+            retlen += min(end, self.__ends[i]) - max(start, self.__starts[i])
 
         return retlen
 
@@ -155,14 +250,18 @@ class range_t():
         bool
             ``True`` if **whole** examined range is present in object. Otherwise ``False``.
         """
-        
-        conv = self.__val_convert(val) # conversion
-        return self.contains(val) == conv[1] - conv[0]
+
+        (start, end) = self.__val_convert(val) # conversion
+
+        # subranges are merged, so the whole range has to fit in a single one.
+        i = bisect_right(self.__starts, start) - 1
+
+        return i >= 0 and self.__ends[i] >= end
 
     def match(self, val):
 
         """
-        Search for overlapping with `val` subranges. In fact, it is a visible wrapper of hidden ``__match_l``.
+        Search for overlapping with `val` subranges.
 
         Parameters
         ----------
@@ -174,10 +273,89 @@ class range_t():
         set
             Set of overlapping subranges.
         """
-        
-        conv = self.__val_convert(val) # conversion
 
-        return self.__match_l(conv, self.__has)
+        (start, end) = self.__val_convert(val) # conversion
+        (lo, hi) = self.__span(start, end)
+
+        return set(zip(self.__starts[lo:hi], self.__ends[lo:hi]))
+
+    def missing(self, val):
+
+        """
+        Generate sub-intervals of `val` which are not present in the object, in ascending order. Every step is a binary
+        search from the position where the previous one ended, so the object may be modified between steps (e.g. when
+        missing data is being downloaded), and no intermediate ``range_t`` object is built.
+
+        Parameters
+        ----------
+        val : int or tuple or list or range
+            Range or integer being checked.
+
+        Yields
+        ------
+        tuple
+            Missing subrange.
+        """
+
+        (pos, end) = self.__val_convert(val) # conversion
+
+        while pos < end:
+
+            i = bisect_right(self.__starts, pos) - 1
+
+            if i >= 0 and self.__ends[i] > pos: # pos is present, jump to the end of its subrange.
+                pos = self.__ends[i]
+                continue
+
+            try:
+                gap_end = min(self.__starts[i + 1], end)
+            except IndexError:
+                gap_end = end
+
+            yield (pos, gap_end)
+
+            pos = gap_end
+
+    def first_missing(self, offset):
+
+        """
+        Find first value, greater or equal to `offset`, which is not present in the object.
+
+        Parameters
+        ----------
+        offset : int
+            Position from which searching starts.
+
+        Returns
+        -------
+        int
+            First missing value.
+        """
+
+        i = bisect_right(self.__starts, offset) - 1
+
+        if i >= 0 and self.__ends[i] > offset:
+            return self.__ends[i]
+
+        return offset
+
+    def contiguous(self, offset):
+
+        """
+        Length of present data which begins at `offset` and has no holes.
+
+        Parameters
+        ----------
+        offset : int
+            Position from which length is measured.
+
+        Returns
+        -------
+        int
+            Length of contiguous range, ``0`` if `offset` is not present.
+        """
+
+        return self.first_missing(offset) - offset
 
     def toset(self):
 
@@ -187,38 +365,47 @@ class range_t():
         Returns
         -------
         set
-            ``self.__has`` is returned.
+            New set of subranges.
         """
 
-        return self.__has
+        return set(zip(self.__starts, self.__ends))
 
     def __add(self, val):
 
         """
         Helper method for range addition. It is allowed to add only one compact subrange or ``range_t`` object at once.
+        Object is modified in place.
 
         Parameters
         ----------
         val : int or tuple or list or range
             Integer or range to add.
-
-        Returns
-        -------
-        __has : set
-            ``self.__has`` extended by `val`.
         """
 
-        if not isinstance(val, range_t):
-            #sanitize it
-            val = {self.__val_convert(val)} # convert to a set, coz I like it that way.
+        if isinstance(val, range_t):
+            self.update_many(val)
 
         else:
-            val = val.toset()
+            (start, end) = self.__val_convert(val)
+            self.__insert(start, end)
+
+    def __copy(self):
+
+        """
+        Make a shallow copy of the object. Subranges are immutable integers, so there's no need for ``deepcopy``.
+
+        Returns
+        -------
+        range_t
+            New ``range_t`` object with the same subranges.
+        """
 
-        __has = deepcopy(self.__has) # simply add to a set.
-        __has.update(val)
+        ret = range_t()
+        ret.__starts = self.__starts[:]
+        ret.__ends = self.__ends[:]
+        ret.__len = self.__len
 
-        return __has
+        return ret
 
     def __add__(self, val):
 
@@ -236,7 +423,10 @@ class range_t():
             New ``range_t`` object extended by `val`.
         """
 
-        return range_t(self.__add(val))
+        ret = self.__copy()
+        ret.__add(val)
+
+        return ret
 
     def __iadd__(self, val):
 
@@ -254,8 +444,7 @@ class range_t():
             No new object is created, the current one is extended by `val` and returned.
         """
 
-        self.__has = self.__add(val)
-        self.__optimize()
+        self.__add(val)
 
         return self
 
@@ -263,7 +452,7 @@ class range_t():
 
         """
         Substracting support.
-        
+
         Parameters
         ----------
         val : int or tuple or list or range
@@ -275,27 +464,148 @@ class range_t():
             New ``range_t`` object bereft of `val`.
         """
 
-        if not isinstance(val, range_t):
-            #sanitize it!
-            val = {self.__val_convert(val)}
+        ret = self.__copy()
+        ret -= val
+
+        return ret
+
+    def __isub__(self, val):
+
+        """
+        ``a -= b`` operation support. No new object is created.
+
+        Parameters
+        ----------
+        val : int or tuple or list or range
+            Integer or range to substract.
+
+        Returns
+        -------
+        self : range_t
+            The current object bereft of `val`.
+        """
+
+        if isinstance(val, range_t):
+            self.discard_many(val)
+
         else:
-            val = val.toset()
+            (start, end) = self.__val_convert(val) #sanitize it!
+            self.__remove(start, end)
+
+        return self
+
+    def update_many(self, vals):
+
+        """
+        Add many ranges at once. Input is sorted and merged with the object in a single pass.
+
+        Parameters
+        ----------
+        vals : iterable or range_t
+            Integers or ranges to add, or ``range_t`` object.
+        """
+
+        vals = self.__pairs(vals)
+
+        if not vals:
+            return
+
+        if len(vals) == 1:
+            self.__insert(vals[0][0], vals[0][1])
+            return
+
+        starts = []
+        ends = []
+        length = 0
 
-        __has = deepcopy(self.__has)
+        i = 0
+        j = 0
+        n = len(self.__starts)
+        m = len(vals)
 
-        for v in val:
-            common = self.__match_l(v, __has) # search for colliding subranges.
-            if not common: continue # no collisions - nothing to substract.
+        while i < n or j < m:
 
-            __has.difference_update(common) # we delete collisions, beacause we need to cut them.
+            # pick subrange which begins first.
+            if j == m or (i < n and self.__starts[i] <= vals[j][0]):
+                (start, end) = (self.__starts[i], self.__ends[i])
+                i += 1
+            else:
+                (start, end) = vals[j]
+                j += 1
 
-            minmax = (min({l[0] for l in common}), max({r[1] for r in common}))
+            if ends and start <= ends[-1]: # overlaps or touches the last one.
+                if end > ends[-1]:
+                    length += end - ends[-1]
+                    ends[-1] = end
+            else:
+                starts.append(start)
+                ends.append(end)
+                length += end - start
 
-            if minmax[0] < v[0]: __has.add((minmax[0], v[0]))
-            if minmax[1] > v[1]: __has.add((v[1], minmax[1]))
-            # we get two, one or zero "new" subranges. __optimize is not necessary.
+        self.__starts = starts
+        self.__ends = ends
+        self.__len = length
 
-        return range_t(__has)
+    def discard_many(self, vals):
+
+        """
+        Remove many ranges at once. Input is sorted and cut out of the object in a single pass.
+
+        Parameters
+        ----------
+        vals : iterable or range_t
+            Integers or ranges to remove, or ``range_t`` object.
+        """
+
+        vals = self.__pairs(vals)
+
+        if not vals:
+            return
+
+        if len(vals) == 1:
+            self.__remove(vals[0][0], vals[0][1])
+            return
+
+        starts = []
+        ends = []
+        length = 0
+
+        j = 0
+        m = len(vals)
+
+        for (start, end) in zip(self.__starts, self.__ends):
+
+            while j < m and vals[j][1] <= start: # removals that end before this subrange are done.
+                j += 1
+
+            k = j
+            pos = start
+
+            while k < m and vals[k][0] < end:
+
+                if vals[k][0] > pos:
+                    starts.append(pos)
+                    ends.append(vals[k][0])
+                    length += vals[k][0] - pos
+
+                if vals[k][1] > pos:
+                    pos = vals[k][1]
+
+                if pos >= end: # this removal may reach next subrange, so it is not skipped.
+                    break
+
+                k += 1
+
+            if pos < end:
+                starts.append(pos)
+                ends.append(end)
+                length += end - pos
+
+            j = k
+
+        self.__starts = starts
+        self.__ends = ends
+        self.__len = length
 
     def __len__(self):
 
@@ -304,15 +614,11 @@ class range_t():
 
         Returns
         -------
-        ret : int
+        int
             Sum of subranges lengths.
         """
 
-        ret = 0
-        for t in self.__has:
-            ret += t[1] - t[0]
-
-        return ret
+        return self.__len
 
     def __eq__(self, val):
 
@@ -332,4 +638,4 @@ class range_t():
         if not isinstance(val, range_t):
             raise ValueError("Expected range_t to compare.")
 
-        return self.__has == val.toset()
+        return self.__starts == val.__starts and self.__ends == val.__ends
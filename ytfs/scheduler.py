@@ -0,0 +1,309 @@
+"""
+Module that provides a global scheduler of downloads. Every HTTP transfer of movie data asks it for a slot first, and
+reports transferred data, so priorities, fairness between files and bandwidth limits are enforced in one place.
+"""
+
+from time import time, sleep
+from threading import Lock, Condition
+from contextlib import contextmanager
+from weakref import WeakKeyDictionary
+
+class TokenBucket():
+
+    """
+    Token bucket used for rate limiting. Bucket holds at most one second worth of tokens. Part of them can be reserved
+    for more important transfers: less important ones wait until the bucket is filled above the reserve.
+
+    Attributes
+    ----------
+    rate : int
+        Tokens (bytes) added per second.
+    tokens : float
+        Tokens currently available. Negative value is a debt that has to be waited out.
+    stamp : float
+        Time of the last refill.
+
+    Parameters
+    ----------
+    rate : int
+        Tokens (bytes) added per second.
+    """
+
+    def __init__(self, rate):
+
+        self.rate = rate
+        self.tokens = rate
+        self.stamp = time()
+
+    def consume(self, n, reserve=0):
+
+        """
+        Take `n` tokens.
+
+        Parameters
+        ----------
+        n : int
+            Number of tokens.
+        reserve : int, optional
+            Tokens that have to be left for others; caller waits until the bucket holds more than that.
+
+        Returns
+        -------
+        float
+            How many seconds caller has to wait, before taking next tokens is fair.
+        """
+
+        now = time()
+        self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+        self.tokens -= n
+
+        return max(0, (reserve - self.tokens) / self.rate)
+
+
+class Scheduler():
+
+    """
+    Global download scheduler. Transfers are run in slots: at most ``concurrency`` at once, at most ``per_file`` for one
+    ``YTStor`` object. When a slot frees, it is given to the waiting transfer of the highest priority; among transfers
+    of the same priority, to the one whose file has the fewest transfers running (so open files share bandwidth fairly),
+    and then to the one which waits longest.
+
+    Priority alone would only order the queue, so ``reserved`` slots are kept for ``FOREGROUND`` transfers: background
+    transfers never take them, and a blocked reader gets a slot at once, however many preloads run. Background
+    transfers are also split into requests of ``Downloader.preferences['block_size']`` bytes, each in its own slot (see
+    ``Downloader.fetchRange``). While ``FOREGROUND`` transfers run, background ones leave half of every token bucket
+    to them.
+
+    Attributes
+    ----------
+    FOREGROUND : int
+        Priority of transfers that a reading process is blocked on.
+    PREFETCH : int
+        Priority of read-ahead transfers.
+    BULK : int
+        Priority of whole file downloads (preloading, merging).
+    preferences : dict
+        ``concurrency`` - maximum number of transfers at once; ``per_file`` - maximum number of transfers for one
+        file; ``reserved`` - number of slots which only ``FOREGROUND`` transfers can use (at least one slot is always
+        left for others); ``rate`` - global bandwidth limit in bytes per second; ``file_rate`` - bandwidth limit for
+        one file. ``0`` means no bandwidth limit.
+    cond : Condition
+        Guards scheduler state.
+    waiting : list
+        Transfers waiting for a slot, as ``(priority, sequence number, yts)`` tuples.
+    active : dict
+        Number of running transfers for every file.
+    foreground : dict
+        Number of running ``FOREGROUND`` transfers for every file.
+    running : int
+        Number of all running transfers.
+    bucket : TokenBucket or None
+        Global rate limiter.
+    buckets : WeakKeyDictionary
+        Per file rate limiters.
+    counters : dict
+        Statistics, see ``stats``.
+    """
+
+    FOREGROUND = 0
+    PREFETCH = 1
+    BULK = 2
+
+    preferences = {
+        "concurrency": 16,
+        "per_file": 8,
+        "reserved": 4,
+        "rate": 0,
+        "file_rate": 0
+    }
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the global scheduler. It is created on first use, with preferences set at that moment.
+
+        Returns
+        -------
+        Scheduler
+            The scheduler.
+        """
+
+        with cls.__instance_lock:
+
+            if cls.__instance is None:
+                cls.__instance = cls()
+
+            return cls.__instance
+
+    def __init__(self):
+
+        self.cond = Condition()
+        self.waiting = []
+        self.active = dict()
+        self.foreground = dict()
+        self.running = 0
+        self.seq = 0
+
+        self.bucket = TokenBucket(self.preferences['rate']) if self.preferences['rate'] else None
+        self.buckets = WeakKeyDictionary()
+        self.rate_lock = Lock()
+
+        self.counters = {
+            "granted": [0, 0, 0],
+            "wait_time": [0.0, 0.0, 0.0],
+            "max_wait": [0.0, 0.0, 0.0],
+            "bytes": [0, 0, 0]
+        }
+
+    def __pick(self):
+
+        """
+        Choose waiting transfer which should get a free slot. Has to be called with ``self.cond`` acquired.
+
+        Returns
+        -------
+        tuple or None
+            Chosen ``self.waiting`` entry or ``None``, if no transfer may start now.
+        """
+
+        if self.running >= self.preferences['concurrency']:
+            return None
+
+        background = max(1, self.preferences['concurrency'] - self.preferences['reserved'])
+
+        eligible = [w for w in self.waiting if self.active.get(w[2], 0) < self.preferences['per_file']
+                and (w[0] == self.FOREGROUND or self.running < background)]
+
+        if not eligible:
+            return None
+
+        return min(eligible, key=lambda w: (w[0], self.active.get(w[2], 0), w[1]))
+
+    @contextmanager
+    def slot(self, yts, priority):
+
+        """
+        Context manager which waits for a transfer slot and holds it.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Object for which data will be transferred.
+        priority : int
+            ``FOREGROUND``, ``PREFETCH`` or ``BULK``.
+        """
+
+        with self.cond:
+
+            entry = (priority, self.seq, yts)
+            self.seq += 1
+            self.waiting.append(entry)
+
+            start = time()
+
+            while self.__pick() is not entry:
+                self.cond.wait()
+
+            self.waiting.remove(entry)
+            self.active[yts] = self.active.get(yts, 0) + 1
+            self.running += 1
+
+            if priority == self.FOREGROUND:
+                self.foreground[yts] = self.foreground.get(yts, 0) + 1
+
+            waited = time() - start
+            self.counters['granted'][priority] += 1
+            self.counters['wait_time'][priority] += waited
+            self.counters['max_wait'][priority] = max(self.counters['max_wait'][priority], waited)
+
+            self.cond.notify_all() # more slots may be free.
+
+        try:
+            yield
+
+        finally:
+            with self.cond:
+
+                self.running -= 1
+                self.active[yts] -= 1
+                if not self.active[yts]: del self.active[yts]
+
+                if priority == self.FOREGROUND:
+                    self.foreground[yts] -= 1
+                    if not self.foreground[yts]: del self.foreground[yts]
+
+                self.cond.notify_all()
+
+    def throttle(self, yts, n, priority):
+
+        """
+        Report `n` bytes transferred for `yts` and sleep as long as bandwidth limits require. Background transfers
+        sleep longer while ``FOREGROUND`` transfers run, so most of the bandwidth goes to those.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Object for which data was transferred.
+        n : int
+            Number of bytes.
+        priority : int
+            Priority of the transfer.
+        """
+
+        delay = 0
+
+        with self.rate_lock:
+
+            self.counters['bytes'][priority] += n
+
+            background = priority != self.FOREGROUND
+
+            if self.bucket is not None:
+                reserve = self.bucket.rate // 2 if background and self.foreground else 0
+                delay = self.bucket.consume(n, reserve)
+
+            if self.preferences['file_rate']:
+
+                try:
+                    bucket = self.buckets[yts]
+                except KeyError:
+                    bucket = self.buckets[yts] = TokenBucket(self.preferences['file_rate'])
+
+                reserve = bucket.rate // 2 if background and self.foreground.get(yts) else 0
+                delay = max(delay, bucket.consume(n, reserve))
+
+        if delay:
+            sleep(delay)
+
+    def stats(self):
+
+        """
+        Scheduler statistics. Lists are indexed by priority.
+
+        Returns
+        -------
+        dict
+            ``queued`` - transfers waiting for a slot; ``running`` - transfers running now; ``granted`` - slots given
+            so far; ``avg_wait`` and ``max_wait`` - average and maximum time of waiting for a slot (in seconds);
+            ``bytes`` - bytes transferred.
+        """
+
+        with self.cond:
+
+            queued = [0, 0, 0]
+            for w in self.waiting: queued[w[0]] += 1
+
+            return {
+                "queued": queued,
+                "running": self.running,
+                "granted": list(self.counters['granted']),
+                "avg_wait": [t / max(1, g) for (t, g) in zip(self.counters['wait_time'], self.counters['granted'])],
+                "max_wait": list(self.counters['max_wait']),
+                "bytes": list(self.counters['bytes'])
+            }
@@ -0,0 +1,148 @@
+"""
+Module that provides one HTTP session shared by the whole process, so connections (and TLS handshakes) are reused by
+every object which talks to the network.
+"""
+
+import requests
+from threading import Lock
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+class ConnectionCounter():
+
+    """
+    Mixin for urllib3 connection classes. Every TCP connection opened is counted in ``SharedSession``, also when
+    urllib3 reconnects an existing connection object (e.g. after server closed a kept-alive connection), which its own
+    counters don't see.
+    """
+
+    def _new_conn(self):
+
+        conn = super()._new_conn()
+        SharedSession.connected()
+
+        return conn
+
+class CountingHTTPConnection(ConnectionCounter, HTTPConnection):
+    pass
+
+class CountingHTTPSConnection(ConnectionCounter, HTTPSConnection):
+    pass
+
+class CountingHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = CountingHTTPConnection
+
+class CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = CountingHTTPSConnection
+
+class SharedSession():
+
+    """
+    Process-wide ``requests.Session`` with bounded connection pools. ``YTStor``, ``YTMetaStor`` and ``YTActions`` draw
+    connections from it, so an open file, a thumbnail and a search page all reuse kept-alive connections to the same
+    hosts instead of opening their own.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``hosts`` - number of hosts for which connection pools are kept; ``per_host`` - maximum number of connections
+        to one host. When all connections to a host are busy, next request waits for a free one.
+    __session : requests.Session or None
+        The shared session, created on first use.
+    __adapters : list
+        Transport adapters mounted in the session.
+    __connections : int
+        Number of TCP connections opened so far.
+    __lock : Lock
+        Guards session creation and counters.
+    """
+
+    preferences = {
+        "hosts": 16,
+        "per_host": 16
+    }
+
+    __session = None
+    __adapters = []
+    __connections = 0
+    __lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the shared session.
+
+        Returns
+        -------
+        requests.Session
+            Session to use for HTTP requests.
+        """
+
+        with cls.__lock:
+
+            if cls.__session is None:
+
+                session = requests.Session()
+
+                cls.__adapters = []
+
+                for prefix in ('https://', 'http://'):
+
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=cls.preferences['hosts'],
+                            pool_maxsize=cls.preferences['per_host'], pool_block=True)
+
+                    adapter.poolmanager.pool_classes_by_scheme = {"http": CountingHTTPConnectionPool,
+                            "https": CountingHTTPSConnectionPool}
+
+                    session.mount(prefix, adapter)
+                    cls.__adapters.append(adapter)
+
+                cls.__session = session
+
+            return cls.__session
+
+    @classmethod
+    def connected(cls):
+
+        """
+        Count a new TCP connection. Called by ``ConnectionCounter``.
+        """
+
+        with cls.__lock:
+            cls.__connections += 1
+
+    @classmethod
+    def stats(cls):
+
+        """
+        Connection reuse statistics.
+
+        Returns
+        -------
+        dict
+            ``hosts`` - number of hosts with a connection pool; ``requests`` - requests sent; ``connections`` - TCP
+            connections opened, reconnections included; ``reused`` - requests sent over an already open connection.
+        """
+
+        ret = {"hosts": 0, "requests": 0}
+
+        with cls.__lock:
+
+            ret['connections'] = cls.__connections
+
+            for adapter in cls.__adapters:
+
+                pools = adapter.poolmanager.pools
+
+                for key in list(pools.keys()):
+
+                    pool = pools.get(key)
+                    if pool is None: continue # evicted in the meantime.
+
+                    ret['hosts'] += 1
+                    ret['requests'] += pool.num_requests
+
+        ret['reused'] = max(0, ret['requests'] - ret['connections'])
+
+        return ret
@@ -5,15 +5,22 @@ Module responsible for downloading multimedia from Internet services. As for now
 import os
 import youtube_dl
 import requests
-import tempfile
+import subprocess
 from time import time, sleep
 from calendar import timegm
 from datetime import datetime
-from threading import Lock
+from threading import Lock, Condition, Thread, Timer
+from concurrent.futures import ThreadPoolExecutor, wait
 from copy import deepcopy
-from io import BytesIO
+from urllib.parse import urlparse, parse_qs
 
 from .range_t import range_t
+from .session import SharedSession
+from .scheduler import Scheduler
+from .cache import BlockCache, MetaCache
+from .storage import SpooledStorage
+from .extractor import ExtractorPool
+from .infocache import InfoCache
 
 class Downloader():
 
@@ -22,14 +29,318 @@ class Downloader():
     than aforementioned ``YTStor``, is capable of using ``Downloader``).
     """
 
+    preferences = {
+        "block_size": 1 << 21, # 2 MiB
+        "merge_gap": 1 << 18,
+        "min_request": 1 << 19,
+        "segments": 8,
+        "min_segment": 1 << 20,
+        "retries": 3,
+        "chunk_size": 1 << 16,
+        "probes": 4
+    }
+
     class FetchError(Exception):
         pass
 
+    class UrlExpired(FetchError):
+
+        """
+        Server refused to send data from an url (``403`` or ``410``), because it has expired or it's bound to another
+        IP address. The url is the only argument.
+        """
+
+    @classmethod
+    def plan(cls, yts, needed_range):
+
+        """
+        Plan HTTP requests needed to obtain `needed_range`. Range is extended to block boundaries, then missing parts
+        of it are found. Holes separated by less than ``merge_gap`` bytes of available data are coalesced into one
+        request (downloading this data again is cheaper than another request), and every request is extended to at
+        least ``min_request`` bytes, but never into available data.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Stor-like object for which we plan.
+        needed_range : tuple
+            Two element tuple that represents a data range - compliant with ``range_t`` subrange definition.
+
+        Returns
+        -------
+        plan : list
+            Ranges to download, in ascending order.
+        """
+
+        bs = cls.preferences['block_size']
+
+        start = needed_range[0] // bs * bs
+        end = min(-(-needed_range[1] // bs) * bs, yts.filesize)
+
+        plan = []
+
+        if start >= end:
+            return plan
+
+        for (s, e) in yts.avail.missing((start, end)):
+
+            if plan and s - plan[-1][1] <= cls.preferences['merge_gap']:
+                plan[-1] = (plan[-1][0], e)
+            else:
+                plan.append((s, e))
+
+        for i, (s, e) in enumerate(plan):
+            pad = min(s + cls.preferences['min_request'], yts.filesize)
+            if e < pad:
+                pad = next(yts.avail.missing((e, pad)), (e, e))
+                if pad[0] == e: # only as far as the first available byte.
+                    plan[i] = (s, pad[1])
+
+        return plan
+
+    @staticmethod
+    def store(yts, offset, data):
+
+        """
+        Write a piece of downloaded data at its offset in `yts` object, mark it as available and wake up threads
+        waiting for data.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Stor-like object to which we will write.
+        offset : int
+            Where to write.
+        data : bytes
+            Data to write.
+
+        Returns
+        -------
+        bool
+            ``False`` if `yts` has been closed in the meantime and nothing was written.
+        """
+
+        if not yts.data.pwrite(offset, data): # positional write, concurrent with reads and other writes.
+            return False
+
+        with yts.lock: # only bookkeeping is guarded.
+            yts.avail += (offset, offset + len(data))
+            yts.received += len(data)
+            yts.cond.notify_all()
+
+        return True
+
+    @staticmethod
+    def probe(session, url):
+
+        """
+        Find size of a file without downloading it. Size is taken from ``clen`` url parameter, if it's there;
+        otherwise from ``Content-Length`` of response to HEAD request. If server doesn't tell it, one byte is requested
+        and size is read from ``Content-Range`` header of the response. Responses are read to the end, so connections
+        go back to the pool of `session`.
+
+        Parameters
+        ----------
+        session : requests.Session
+            Session used for the request.
+        url : str
+            Url of the file.
+
+        Returns
+        -------
+        int
+            File size, 0 if it couldn't be found.
+        """
+
+        try:
+            return int(parse_qs(urlparse(url).query)['clen'][0])
+        except (KeyError, ValueError):
+            pass
+
+        try:
+            head = session.head(url, allow_redirects=True)
+
+            if head.status_code == 200 and int(head.headers.get('content-length', 0)) > 0:
+                return int(head.headers['content-length'])
+
+        except (requests.exceptions.RequestException, ValueError):
+            pass
+
+        try:
+            get = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True)
+
+            try:
+                if get.headers.get('content-range'):
+                    get.content # one byte.
+                    return int(get.headers['content-range'].split('/')[1])
+
+                if get.status_code == 200: # range ignored - length of the whole file, don't download it.
+                    return int(get.headers.get('content-length', 0))
+
+            finally:
+                get.close()
+
+        except (requests.exceptions.RequestException, ValueError, IndexError):
+            pass
+
+        return 0
+
+    @classmethod
+    def probeMany(cls, session, formats):
+
+        """
+        Find sizes of many files. Known sizes are used as they are, unknown are found with ``probe``, concurrently
+        (at most ``probes`` at once).
+
+        Parameters
+        ----------
+        session : requests.Session
+            Session used for requests.
+        formats : list
+            Tuples of url and size (``float('inf')`` if unknown).
+
+        Returns
+        -------
+        list
+            Sizes, in order of `formats`; 0 if size couldn't be found.
+        """
+
+        sizes = [int(f[1]) if f[1] != float('inf') else None for f in formats]
+        unknown = [i for (i, size) in enumerate(sizes) if size is None]
+
+        if len(unknown) == 1:
+            sizes[unknown[0]] = cls.probe(session, formats[unknown[0]][0])
+
+        elif unknown:
+            with ThreadPoolExecutor(max_workers=min(len(unknown), cls.preferences['probes'])) as pool:
+                for (i, size) in zip(unknown, pool.map(lambda i: cls.probe(session, formats[i][0]), unknown)):
+                    sizes[i] = size
+
+        return sizes
+
+    @staticmethod
+    def fetchRange(yts, url, needed_range, priority=Scheduler.FOREGROUND):
+
+        """
+        Download a range of data with HTTP Range requests and write it at its offset in `yts` object. Response is read
+        in ``chunk_size`` pieces, each one is written and marked as available as soon as it arrives, so threads waiting
+        for the beginning of the range don't wait for the whole response, and no more than one piece is held in
+        memory. If server sends less than requested, the rest is requested again. Every request runs in a ``Scheduler``
+        slot; background requests are no longer than ``block_size``, so a slot is never held by them for long.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Stor-like object to which we will write.
+        url : str
+            Url to download from.
+        needed_range : tuple
+            Range to download.
+        priority : int, optional
+            Scheduler priority of the download. ``Scheduler.FOREGROUND`` by default.
+
+        Raises
+        ------
+        Downloader.UrlExpired
+            When `url` can't be used any more.
+        Downloader.FetchError
+            When server sends something else than requested range.
+        """
+
+        sched = Scheduler.get()
+        pos = needed_range[0]
+
+        while pos < needed_range[1]:
+
+            stop = needed_range[1]
+
+            if priority != Scheduler.FOREGROUND:
+                stop = min(stop, pos + Downloader.preferences['block_size'])
+
+            with sched.slot(yts, priority):
+
+                get = yts.r_session.get(url, headers={'Range': 'bytes={}-{}'.format(pos, stop - 1)}, stream=True)
+
+                try:
+                    if get.status_code in (403, 410):
+                        raise Downloader.UrlExpired(url)
+
+                    if get.status_code != 206 or not get.headers.get('content-range'):
+                        raise Downloader.FetchError("Unexpected response {} for range {}-{}".format(get.status_code,
+                                pos, stop))
+
+                    end = int(get.headers['content-range'].split(' ')[1].split('-')[0])
+
+                    for chunk in get.iter_content(chunk_size=Downloader.preferences['chunk_size']):
+
+                        if not Downloader.store(yts, end, chunk):
+                            return
+
+                        end += len(chunk)
+
+                        sched.throttle(yts, len(chunk), priority)
+
+                finally:
+                    get.close()
+
+            if end <= pos: # no progress.
+                raise Downloader.FetchError("Empty response for range {}-{}".format(pos, needed_range[1]))
+
+            pos = end
+
+    @classmethod
+    def fetchSegments(cls, yts, url, needed_range):
+
+        """
+        Download a range of data in parallel. Range is split into at most ``segments`` parts (each one not smaller than
+        ``min_segment`` bytes), which are downloaded concurrently with ``fetchRange``. Failed segments - and only them -
+        are retried up to ``retries`` times.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Stor-like object to which we will write.
+        url : str
+            Url to download from.
+        needed_range : tuple
+            Range to download.
+        """
+
+        size = needed_range[1] - needed_range[0]
+        count = max(1, min(cls.preferences['segments'], size // cls.preferences['min_segment']))
+        seg = -(-size // count)
+
+        pending = [(b, min(b + seg, needed_range[1])) for b in range(needed_range[0], needed_range[1], seg)]
+
+        with ThreadPoolExecutor(max_workers=count) as pool:
+
+            for attempt in range(cls.preferences['retries'] + 1):
+
+                # segment may have been partially downloaded, then only the rest of it is requested.
+                futures = {pool.submit(cls.fetchRange, yts, url, (yts.avail.first_missing(r[0]), r[1]), Scheduler.BULK): r
+                        for r in pending if yts.avail.first_missing(r[0]) < r[1]}
+
+                wait(futures)
+
+                failed = [f for f in futures if f.exception() is not None]
+                pending = [futures[f] for f in failed]
+
+                if not pending:
+                    return
+
+                for f in failed:
+                    if isinstance(f.exception(), Downloader.UrlExpired): # retrying won't help.
+                        raise f.exception()
+
+        raise failed[0].exception()
+
     @staticmethod
-    def fetch(yts, needed_range, fh):
+    def fetch(yts, needed_range, fh, priority=Scheduler.FOREGROUND):
 
         """
-        Download desired range of data and put it in `yts` object (e.g. ``YTStor``).
+        Download desired range of data and put it in `yts` object (e.g. ``YTStor``). Network transfer is done without
+        holding ``yts.lock``, it is acquired only for writing obtained data. `needed_range` has to be claimed first
+        (see ``YTStor.claim``); the claim is released when method ends, whether download succeeds or not.
 
         Parameters
         ----------
@@ -39,141 +350,1344 @@ class Downloader():
             Two element tuple that represents a data range - compliant with ``range_t`` subrange definition.
         fh : int
             Descriptor used by a process for filesystem operations.
-        
+        priority : int, optional
+            Scheduler priority of streaming downloads. Whole file downloads always run as ``Scheduler.BULK``.
+
         Returns
         -------
         None
             Method does not return; data is written directly to `yts` object.
         """
 
-        if yts.preferences['audio'] and yts.preferences['video'] and isinstance(yts.url, tuple) and not yts.preferences['stream']:
-            #condition for merging.
+        try:
+            if yts.preferences['audio'] and yts.preferences['video'] and isinstance(yts.url, tuple) and not yts.preferences['stream']:
+                #condition for merging.
+
+                with yts.lock:
+                    yts.rollover() # whole movie goes there - don't keep it in memory.
+
+                yts.merger = Merger(yts, yts.url)
+
+                try:
+                    with Scheduler.get().slot(yts, Scheduler.BULK): # one slot for both streams - they depend on each other.
+                        yts.merger.run()
+                finally:
+                    yts.merger = None
+
+            else: # no merging
 
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as d, tempfile.NamedTemporaryFile(prefix='a') as a, tempfile.NamedTemporaryFile(prefix='v') as v:
-                # after with statement, files - save d - shall be removed
+                if yts.preferences['stream'] is False: # preload
 
-                v.write(yts.r_session.get(yts.url[0]).content)
-                a.write(yts.r_session.get(yts.url[1]).content)
+                    with yts.lock:
+                        yts.rollover() # whole movie goes there - don't keep it in memory.
 
-                PP = youtube_dl.postprocessor.FFmpegMergerPP(yts.ytdl)
-                PP.run({'filepath': d.name, '__files_to_merge': (v.name, a.name)}) # merge
+                    Downloader.fetchSegments(yts, yts.url, (0, yts.filesize))
 
-                _d = d.name
+                else: # stream
+                    Downloader.fetchRange(yts, yts.url, needed_range, priority)
+
+        finally:
+            yts.release([needed_range])
+            yts.commitCache()
 
-            with open(_d, mode="rb") as d:
 
-                yts.data.write( d.read() )
-                yts.data.flush()
+class Merger():
 
-                yts.filesize = os.path.getsize(_d)
+    """
+    Pipeline that merges separate video and audio streams into one file. Both streams are downloaded concurrently and
+    fed through pipes to FFmpeg (or Libav), which writes fragmented MP4 to its standard output. Output is written
+    straight to ``yts.data``, so neither downloaded streams nor merged file ever touch a temporary file, and network
+    transfer overlaps with merging.
 
-                yts.avail += (0, yts.filesize)
+    Attributes
+    ----------
+    yts : YTStor
+        Object to which merged data is written.
+    urls : tuple
+        Video and audio url.
+    sizes : list
+        Sizes of video and audio streams, ``None`` if unknown.
+    received : list
+        How many bytes of video and audio streams have been downloaded.
+    merged : int
+        How many bytes of merged file have been written.
+    errors : list
+        Exceptions raised by feeding threads.
 
-            os.remove(_d)
+    Parameters
+    ----------
+    yts : YTStor
+        Object to which merged data will be written.
+    urls : tuple
+        Video and audio url.
+    """
 
-        else: # no merging
+    def __init__(self, yts, urls):
 
-            if yts.preferences['stream'] is False: # preload
+        self.yts = yts
+        self.urls = urls
+        self.sizes = [None, None]
+        self.received = [0, 0]
+        self.merged = 0
+        self.errors = []
 
-                yts.data.write(yts.r_session.get(yts.url).content)
-                yts.data.flush()
+    def progress(self):
 
-                yts.avail += (0, yts.filesize)
+        """
+        Merging progress.
 
-            else: # stream
+        Returns
+        -------
+        float or None
+            Fraction of input streams downloaded so far, ``None`` if their sizes aren't known yet.
+        """
 
-                hr = (needed_range[0], needed_range[1] - 1)
+        if None in self.sizes:
+            return None
 
-                get = yts.r_session.get(yts.url, headers={'Range': 'bytes=' + '-'.join(str(i) for i in hr)})
+        return sum(self.received) / max(1, sum(self.sizes))
 
-                yts.data.seek(hr[0])
-                yts.data.write(get.content)
-                yts.data.flush()
+    def __feed(self, i, fd):
 
-                ret = list( int(s) for s in get.headers.get('content-range').split(' ')[1].split('/')[0].split('-') )
-                ret[1] += 1
+        """
+        Download i-th stream and write it to a pipe. If connection breaks, download is resumed from the last received
+        byte, up to ``Downloader.preferences['retries']`` times.
 
-                yts.avail += tuple(ret)
-                yts.processing_range -= needed_range
+        Parameters
+        ----------
+        i : int
+            Stream index: 0 - video, 1 - audio.
+        fd : int
+            Write end of a pipe.
+        """
 
+        try:
+            with open(fd, 'wb') as pipe:
 
-class YTStor():
+                for attempt in range(Downloader.preferences['retries'] + 1):
+
+                    headers = {'Range': 'bytes={}-'.format(self.received[i])} if self.received[i] else {}
+
+                    try:
+                        get = self.yts.r_session.get(self.urls[i], headers=headers, stream=True)
+
+                        try:
+                            if get.status_code in (403, 410):
+                                raise Downloader.UrlExpired(self.urls[i])
+
+                            if self.sizes[i] is None and get.headers.get('content-length'):
+                                self.sizes[i] = int(get.headers['content-length'])
+
+                            for chunk in get.iter_content(chunk_size=Downloader.preferences['chunk_size']):
+                                pipe.write(chunk)
+                                Scheduler.get().throttle(self.yts, len(chunk), Scheduler.BULK)
+                                self.received[i] += len(chunk)
+
+                        finally:
+                            get.close()
+
+                        return
+
+                    except requests.exceptions.RequestException as e:
+                        err = e
+
+                raise err
+
+        except BrokenPipeError: # merger died, its exit code will tell us more.
+            pass
+
+        except Exception as e:
+            self.errors.append(e)
+
+    def run(self):
+
+        """
+        Download and merge streams. When finished, ``yts.filesize`` is set to merged file size and the whole file is
+        marked as available. If anything fails, nothing is marked as available.
+
+        Raises
+        ------
+        Downloader.FetchError
+            When merging fails or no FFmpeg/Libav executable is found.
+        """
+
+        with ExtractorPool.get().borrow() as ytdl: # only needed to find the executable.
+            pp = youtube_dl.postprocessor.FFmpegPostProcessor(ytdl)
+
+        if not pp.available:
+            raise Downloader.FetchError("FFmpeg or Libav is needed for merging")
+
+        pipes = [os.pipe(), os.pipe()]
+
+        cmd = [pp.executable, '-loglevel', 'error',
+                '-i', 'pipe:{}'.format(pipes[0][0]), '-i', 'pipe:{}'.format(pipes[1][0]),
+                '-c', 'copy', '-map', '0:v:0', '-map', '1:a:0',
+                '-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov', 'pipe:1'] # fragmented mp4 needs no seeking.
+
+        try:
+            proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL, pass_fds=(pipes[0][0], pipes[1][0]))
+
+        except OSError:
+            for (r, w) in pipes: os.close(w)
+            raise
+
+        finally:
+            for (r, w) in pipes: os.close(r) # read ends belong to the merger now.
+
+        feeders = [Thread(target=self.__feed, args=(i, pipes[i][1]), daemon=True) for i in (0, 1)]
+        for f in feeders: f.start()
+
+        try:
+            for chunk in iter(lambda: proc.stdout.read(Downloader.preferences['chunk_size']), b''):
+
+                if not self.yts.data.pwrite(self.merged, chunk):
+                    break
+
+                self.merged += len(chunk)
+
+        finally:
+            proc.stdout.close()
+            ret = proc.wait()
+            for f in feeders: f.join()
+
+        if self.errors:
+            raise self.errors[0]
+
+        if ret != 0:
+            raise Downloader.FetchError("Merging failed, exit code: {}, progress: {}".format(ret, self.progress()))
+
+        with self.yts.lock:
+
+            if not self.yts.data.closed:
+                self.yts.filesize = self.merged
+                self.yts.avail += (0, self.merged)
+
+
+class ReadAhead():
 
     """
-    ``YTStor`` - the heart of YTFS. Class responsible for obtaining and storing data and information about a movie of
-    given id.
+    Background read-ahead for one ``YTStor`` object. Offsets of consecutive reads are tracked for each descriptor;
+    when a descriptor reads sequentially, data in front of it is downloaded by a background thread, so following
+    reads find it already available. Read-ahead of a descriptor stops when its access pattern turns random, and
+    the whole thread stops when object is closed.
 
     Attributes
     ----------
-    data : SpooledTemporaryFile
-        Temporary file object - actual data is stored here.
+    preferences : dict
+        ``size`` - how many bytes to keep downloaded ahead; ``time`` - how many seconds of the movie to keep
+        downloaded ahead (used only if duration is known, the bigger value of two wins); ``trigger`` - how many
+        sequential reads in a row start read-ahead.
+    yts : YTStor
+        Object for which data is downloaded.
+    lock : Lock
+        Guards read-ahead state.
+    seq : dict
+        Per descriptor tuples: (expected offset of the next read, number of sequential reads in a row).
+    targets : dict
+        Per descriptor ranges which should be downloaded.
+    thread : Thread or None
+        Background thread, running while there's something to download.
+    stopped : bool
+        ``True`` if read-ahead was stopped for good.
+
+    Parameters
+    ----------
+    yts : YTStor
+        Object for which data will be downloaded.
+    """
+
+    preferences = {
+        "size": 1 << 23, # 8 MiB
+        "time": 0,
+        "trigger": 2
+    }
+
+    def __init__(self, yts):
+
+        self.yts = yts
+        self.lock = Lock()
+        self.seq = dict()
+        self.targets = dict()
+        self.thread = None
+        self.stopped = False
+
+    def window(self):
+
+        """
+        Compute how many bytes should be downloaded ahead.
+
+        Returns
+        -------
+        int
+            Read-ahead window size.
+        """
+
+        ret = self.preferences['size']
+
+        if self.preferences['time'] and self.yts.duration:
+            ret = max(ret, int(self.preferences['time'] * self.yts.filesize / self.yts.duration))
+
+        return ret
+
+    def notify(self, offset, length, fh):
+
+        """
+        Report a read. Called by ``YTStor.read``.
+
+        Parameters
+        ----------
+        offset : int
+            Read offset.
+        length : int
+            Length of data read.
+        fh : int
+            File descriptor.
+        """
+
+        window = self.window()
+
+        if not window or self.stopped:
+            return
+
+        with self.lock:
+
+            (expected, count) = self.seq.get(fh, (None, 0))
+
+            if expected is not None and abs(offset - expected) <= max(4 * length, 1 << 17):
+                count += 1
+            else: # random access - forget what was planned for this descriptor.
+                count = 0
+                self.targets.pop(fh, None)
+
+            end = offset + length
+            self.seq[fh] = (end, count)
+
+            if count < self.preferences['trigger']:
+                return
+
+            self.targets[fh] = (end, min(end + window, self.yts.filesize))
+
+            if self.thread is None:
+                self.thread = Thread(target=self.__run, daemon=True)
+                self.thread.start()
+
+    def forget(self, fh):
+
+        """
+        Forget about a descriptor. Called when it is closed.
+
+        Parameters
+        ----------
+        fh : int
+            File descriptor.
+        """
+
+        with self.lock:
+            self.seq.pop(fh, None)
+            self.targets.pop(fh, None)
+
+    def stop(self):
+
+        """
+        Stop read-ahead for good.
+        """
+
+        with self.lock:
+            self.stopped = True
+            self.targets.clear()
+
+    def __next(self):
+
+        """
+        Choose and claim next ranges to download. Data which is available or being downloaded by other threads is
+        skipped. Has to be called with ``self.lock`` acquired.
+
+        Returns
+        -------
+        list
+            Claimed ranges, empty if all targets are available or being downloaded.
+        """
+
+        with self.yts.lock:
+
+            for (fh, target) in sorted(self.targets.items(), key=lambda t: t[1]):
+
+                start = target[0]
+
+                while True: # find first byte that is neither available nor being downloaded.
+                    start = self.yts.avail.first_missing(start)
+                    nxt = self.yts.processing_range.first_missing(start)
+                    if nxt == start: break
+                    start = nxt
+
+                end = min(start + Downloader.preferences['block_size'], target[1]) # one block at a time.
+
+                if start < end:
+                    return self.yts.claim(Downloader.plan(self.yts, (start, end)))
+
+                del self.targets[fh] # whole target is available.
+
+        return []
+
+    def __run(self):
+
+        """
+        Thread body: download targets one block at a time. Thread ends when there's nothing more to download, it
+        will be started again by ``notify``.
+        """
+
+        while True:
+
+            with self.lock:
+
+                mine = [] if self.stopped else self.__next()
+
+                if not mine:
+                    self.thread = None
+                    return
+
+            done = 0
+
+            try:
+                for r in mine:
+                    Downloader.fetch(self.yts, r, None, Scheduler.PREFETCH)
+                    done += 1
+
+            except Exception: # foreground read will retry and report an error.
+                with self.lock:
+                    self.targets.clear()
+
+            finally:
+                self.yts.release(mine[done + 1:])
+
+
+class Eviction():
+
+    """
+    Eviction of data far behind every reader, for long movies watched from the beginning to the end. Data more than
+    ``keep`` bytes behind the lowest position of all open descriptors is removed from ``avail`` and its disk space is
+    freed by punching holes in the file (see ``SparseStorage.punch``), so disk usage of a stream is bounded by
+    ``keep`` and read-ahead window, not by file size. If a reader seeks back, evicted data is downloaded again.
+
+    Data being read or downloaded is never evicted. Data kept in memory isn't evicted, as it can't be freed that way.
+    Only streams are trimmed: whole file downloads (``-P``, merging) would have to download evicted data again, and a
+    persistent cache entry (see ``BlockCache``) is kept to be complete. Evicted ranges stay claimed (see ``YTStor.claim``) until their holes are punched, so a reader who seeks back
+    meanwhile waits, instead of downloading data which would be punched out right away.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``keep`` - how many bytes behind the readers to keep, ``0`` disables eviction; ``step`` - minimal amount of
+        data evicted at once, so holes aren't punched on every read.
+    """
+
+    preferences = {
+        "keep": 0,
+        "step": 1 << 24 # 16 MiB
+    }
+
+    @classmethod
+    def trim(cls, yts):
+
+        """
+        Evict cold data of `yts`, if there's enough of it.
+
+        Parameters
+        ----------
+        yts : YTStor
+            Object which data is evicted.
+        """
+
+        if not cls.preferences['keep'] or yts.preferences['stream'] is False or yts.cache_key is not None:
+            return
+
+        if not yts.data.can_punch():
+            return
+
+        with yts.lock:
+
+            if not yts.positions:
+                return
+
+            low = min(yts.positions.values()) - cls.preferences['keep']
+
+            if low <= 0 or yts.avail.contains((0, low)) < cls.preferences['step']:
+                return
+
+            cold = yts.avail - (low, yts.filesize)
+            cold -= yts.processing_range # downloads in progress would mark their data as available again.
+            cold.discard_many(yts.reading)
+
+            if len(cold) < cls.preferences['step']:
+                return
+
+            ranges = sorted(cold.toset())
+
+            yts.avail -= cold
+            yts.processing_range.update_many(ranges) # nobody downloads it again until the hole is punched.
+
+        try:
+            yts.commitCache(True) # cache index can't claim data we're about to punch out.
+            yts.data.punch(ranges)
+
+        finally:
+            yts.release(ranges)
+
+
+class YTStor():
+
+    """
+    ``YTStor`` - the heart of YTFS. Class responsible for obtaining and storing data and information about a movie of
+    given id.
+
+    Attributes
+    ----------
+    data : SparseStorage
+        Actual data is stored here. It's kept in memory (``SpooledStorage``, within ``MemoryBudget``) until moved to
+        disk, or it's a persistent cache entry.
+    lock : Lock
+        Lock to sync multiple threads. It guards object state only, it's never held during network transfers nor
+        data access.
+    cond : Condition
+        Condition bound to ``lock``. Notified whenever a download ends, so threads waiting for data being downloaded
+        by other threads can check again.
+    fds : set
+        Set of file descriptors assigned to the object.
+    closing : bool
+        ``True`` if ``data`` is scheduled for closing.
+    avail : range_t
+        Object saying how much data we have.
+    processing_range : range_t
+        Data being downloaded at the moment. Ranges are claimed here before a download starts, so no range is
+        downloaded twice at once.
+    received : int
+        Number of bytes downloaded so far, counted by ``Downloader.store``.
+    readahead : ReadAhead
+        Background read-ahead of data for sequential reads.
+    positions : dict
+        Offset of the last read of every descriptor.
+    reading : list
+        Ranges being read at the moment. They're not evicted (see ``Eviction``).
+    merger : Merger or None
+        Audio and video merging pipeline, while it runs. Can be asked about progress.
+    cache_key : str or None
+        Key of persistent cache entry which holds data, ``None`` if data isn't cached.
+    registry_key : tuple or None
+        Key in registry of shared objects (see ``get``), ``None`` if object isn't shared.
+    filesize : int
+        Total data size. Not yet downloaded data is also considered.
+    duration : int or None
+        Movie duration in seconds, if known.
+    extension : str
+        File extension.
+    rickastley : bool
+        Make every video rickroll
+    r_session : requests.Session
+        Object that holds HTTP session, shared by the whole process (see ``SharedSession``). Thanks to that, we avoid
+        useless TCP window size negotiations and TLS handshakes whenever we start a download.
+    yid : str
+        YouTube id of a video which this object represents.
+    preferences : dict
+        Current object preferences.
+    info_key : str
+        Key of information about the movie in ``InfoCache``.
+    refresh_lock : Lock
+        Makes threads which found urls expired obtain new ones one at a time (see ``refreshInfo``).
+    url : str or tuple
+        Url to file. If tuple, then merging is needed; indices: 0: video, 1: audio.
+
+    Parameters
+    ----------
+    init_data : dict
+        Initial data object needed for further operation. ``YTStor`` needs ``yid`` (str, YouTube video id) and
+        ``pub_date`` (video publication date as Unix timestamp).
+    opts : dict
+        Options that will override globally set preferences.
+    """
+
+    preferences = {
+        "audio": True,
+        "video": True,
+        "stream": True,
+        "get_info_on_init": False
+    }
+
+    rickastley = False
+
+    __registry = dict()
+    __registry_lock = Lock()
+
+    @classmethod
+    def key(cls, init_data, opts=dict()):
+
+        """
+        Compute registry key of an object: video id and options which affect downloaded data.
+
+        Parameters
+        ----------
+        init_data : dict
+            Initial data, as for ``YTStor`` constructor.
+        opts : dict
+            Options, as for ``YTStor`` constructor.
+
+        Returns
+        -------
+        tuple
+            Registry key.
+        """
+
+        yid = "dQw4w9WgXcQ" if cls.rickastley else init_data['yid']
+
+        _pref = dict(cls.preferences)
+        _pref.update((k, opts[k]) for k in ('audio', 'video', 'format', 'stream') if k in opts)
+
+        return (yid, _pref['audio'], _pref['video'], _pref.get('format'), _pref['stream'])
+
+    @classmethod
+    def get(cls, init_data, opts=dict()):
+
+        """
+        Obtain a shared object for a movie. Process-wide registry holds one object for every video id and options (see
+        ``key``), so a movie which appears in many searches, or on many pages of a search, is downloaded and stored
+        only once. Every call has to be paired with ``clean``; object is cleaned when the last reference goes away.
+
+        Parameters
+        ----------
+        init_data : dict
+            Initial data, as for ``YTStor`` constructor.
+        opts : dict
+            Options, as for ``YTStor`` constructor.
+
+        Returns
+        -------
+        YTStor
+            Shared object.
+        """
+
+        key = cls.key(init_data, opts)
+
+        with cls.__registry_lock:
+
+            (yts, refs) = cls.__registry.get(key, (None, 0))
+
+            if yts is None:
+                yts = cls(init_data, opts)
+                yts.registry_key = key
+
+            cls.__registry[key] = (yts, refs + 1)
+
+        return yts
+
+    @classmethod
+    def warm(cls, init_data, opts=dict()):
+
+        """
+        Obtain information about a movie in advance, without creating an object. Information is put in ``InfoCache``,
+        where ``loadInfo`` of objects created later finds it.
+
+        Parameters
+        ----------
+        init_data : dict
+            Initial data, as for ``YTStor`` constructor.
+        opts : dict
+            Options, as for ``YTStor`` constructor.
+
+        Returns
+        -------
+        dict
+            Information, as stored in ``InfoCache``.
+
+        Raises
+        ------
+        ConnectionError
+            When extraction fails.
+        """
+
+        key = cls.key(init_data, opts)
+        pref = dict(cls.preferences, audio=key[1], video=key[2], format=key[3], stream=key[4])
+
+        return InfoCache.get().obtain("{}:{}:{}:{}:{}".format(*key), lambda: cls.__extract(key[0], pref))
+
+    @classmethod
+    def merges(cls):
+
+        """
+        Progress of merges running in shared objects (see ``get``).
+
+        Returns
+        -------
+        dict
+            ``Merger.progress`` of every object which merges at the moment, by YouTube id.
+        """
+
+        with cls.__registry_lock:
+            stors = [yts for (yts, refs) in cls.__registry.values()]
+
+        ret = dict()
+
+        for yts in stors:
+            merger = yts.merger
+            if merger is not None:
+                ret[yts.yid] = merger.progress()
+
+        return ret
+
+    def __init__(self, init_data, opts=dict()):
+
+        yid = init_data['yid'] # it must be here.
+
+        if self.rickastley:
+            yid = "dQw4w9WgXcQ" #trolololo
+
+        if not isinstance(yid, str) or len(yid) != 11:
+            raise ValueError("yid expected to be valid Youtube movie identifier") #FIXME
+
+        self.data = SpooledStorage()
+        self.fds = set()
+        self.closing = False
+
+        self.lock = Lock() # lock to prevent threads from colliding
+        self.cond = Condition(self.lock)
+
+        self.avail = range_t()
+        self.processing_range = range_t()
+        self.received = 0
+
+        self.filesize = 4096
+        self.duration = None
+        self.extension = ".mp4" # FIXME
+
+        self.atime = int(time())
+        try:
+            # convert from iso 8601
+            self.ctime = timegm(datetime.strptime(init_data['pub_date'], "%Y-%m-%dT%H:%M:%S.%fZ").timetuple())
+        except KeyError:
+            self.ctime = self.atime
+
+        self.r_session = SharedSession.get()
+
+        self.yid = yid
+
+        _pref = deepcopy(self.preferences) # new object, just to not affect other intances.
+        try: _pref['audio'] = opts['audio']
+        except KeyError: pass
+        try: _pref['video'] = opts['video']
+        except KeyError: pass
+        try: _pref['format'] = opts['format']
+        except KeyError: pass
+        try: _pref['stream'] = opts['stream']
+        except KeyError: pass
+        try: _pref['get_info_on_init'] = opts['get_info_on_init']
+        except KeyError: pass
+        self.preferences = _pref
+        self.info_key = "{}:{}:{}:{}:{}".format(yid, _pref['audio'], _pref['video'], _pref.get('format'), _pref['stream'])
+
+        self.refresh_lock = Lock()
+
+        self.readahead = ReadAhead(self)
+        self.positions = dict()
+        self.reading = []
+        self.merger = None
+        self.cache_key = None
+        self.registry_key = None
+
+    def obtainInfo(self):
+
+        """
+        Method for obtaining information about the movie and preparing for download. Called on every open.
+        """
+
+        self.loadInfo()
+        self.__attachCache()
+
+        return True
+
+    def loadInfo(self):
+
+        """
+        Obtain information about the movie: url, file size and duration. Information is taken from ``InfoCache``,
+        unless it's not there or urls expire soon; then it's extracted and put there. If it's being extracted already
+        (e.g. by ``warm``), it's waited for.
+
+        Raises
+        ------
+        ConnectionError
+            When extraction fails, or when information describes another format than data downloaded so far.
+        """
+
+        info = InfoCache.get().obtain(self.info_key, lambda: self.__extract(self.yid, self.preferences))
+
+        url = tuple(info['url']) if len(info['url']) > 1 else info['url'][0]
+        filesize = info['filesize'] if info['filesize'] is not None else self.filesize
+
+        with self.lock:
+
+            if (self.avail or self.processing_range) and (self.__itags(url) != self.__itags(self.url)
+                    or filesize != self.filesize):
+                raise ConnectionError # data we have can't be mixed with data of another format.
+
+            self.url = url
+            self.filesize = filesize
+            self.duration = info['duration']
+            self.preferences['stream'] = info['stream']
+
+    def refreshInfo(self, url):
+
+        """
+        Obtain information again, because `url` turned out to be expired (or bound to another IP address) earlier than
+        it said. Information in ``InfoCache`` is dropped and extracted again. If another thread has done it already,
+        method returns at once.
+
+        Parameters
+        ----------
+        url : str
+            Url which failed.
+
+        Raises
+        ------
+        ConnectionError
+            When extraction fails, or a format other than the one downloaded so far is chosen.
+        """
+
+        with self.refresh_lock:
+
+            if url not in (self.url if isinstance(self.url, tuple) else (self.url,)):
+                return # refreshed in the meantime.
+
+            InfoCache.get().drop(self.info_key)
+            self.loadInfo()
+
+    def __itags(self, url):
+
+        """
+        Find formats of url(s).
+
+        Parameters
+        ----------
+        url : str or tuple
+            Url or tuple of urls.
+
+        Returns
+        -------
+        list
+            ``itag`` of every url, ``'0'`` if there's none.
+        """
+
+        urls = url if isinstance(url, tuple) else (url,)
+        return [parse_qs(urlparse(u).query).get('itag', ['0'])[0] for u in urls]
+
+    @classmethod
+    def __extract(cls, yid, preferences):
+
+        """
+        Extract information about a movie with youtube_dl and choose format.
+
+        Parameters
+        ----------
+        yid : str
+            YouTube video id.
+        preferences : dict
+            Preferences which decide about format: ``audio``, ``video``, ``stream`` and ``format``.
+
+        Returns
+        -------
+        dict
+            ``url`` - list of urls (two, if merging is needed: video and audio), ``filesize`` - file size (``None`` if
+            merging is needed), ``duration`` - movie duration in seconds (or ``None``), ``stream`` - value of
+            ``stream`` preference to use.
+        """
+
+        try:
+            info = ExtractorPool.get().extract(yid)
+        except youtube_dl.utils.DownloadError:
+            raise ConnectionError
+
+        ret = {"url": None, "filesize": None, "duration": info.get('duration'), "stream": preferences['stream']}
+
+        if not preferences['stream'] and preferences['audio'] and preferences['video']:
+            ret['url'] = [info['requested_formats'][0]['url'], info['requested_formats'][1]['url']]
+            return ret
+
+        # else:
+        for f in info['formats']:
+            if 'filesize' not in f or not f['filesize']:
+                f['filesize'] = float('inf') # next line won't fail, infinity, because unknown filesize is the least preferred
+
+        # - for easy sorting - we'll get best quality and lowest filsize
+        aud = {(-int(f['abr']),    f['filesize'], f['url']) for f in info['formats'] if f.get('abr') and not f.get('height')}
+        vid = {(-int(f['height']), f['filesize'], f['url']) for f in info['formats'] if not f.get('abr') and f.get('height')}
+        full= {(-int(f['height']), f['filesize'], f['url']) for f in info['formats'] if f.get('abr') and f.get('height')}
+
+        try:
+            _f = int( preferences.get('format') ) # if valid format is present, then choose closes value
+            _k = lambda x: abs(x[0] + _f) # +, because x[0] is negative
+
+        except (ValueError, TypeError):
+            _k = lambda d: d
+
+        if preferences['audio'] and preferences['video']: fm = sorted(full, key=_k)
+        elif preferences['audio']: fm = sorted(aud, key=_k)
+        elif preferences['video']: fm = sorted(vid, key=_k)
+
+        filesize = 0
+        step = Downloader.preferences['probes']
+
+        # some videos are problematic, we will try to find format with non-zero filesize. Formats are checked in
+        # batches, so unknown sizes are probed concurrently, but no more than needed.
+        for b in range(0, len(fm), step):
+
+            batch = fm[b:b + step]
+            sizes = Downloader.probeMany(SharedSession.get(), [(f[2], f[1]) for f in batch])
+
+            found = [(f[2], size) for (f, size) in zip(batch, sizes) if size]
+
+            if found:
+                (url, filesize) = found[0]
+                break
+
+        else: # finding filesize failed for every format
+
+            ret['url'] = [info['requested_formats'][0]['url'], info['requested_formats'][1]['url']]
+            ret['stream'] = False # hopefully non-stream download will work
+
+            return ret
+
+        ret.update(url=[url], filesize=filesize)
+
+        return ret
+
+    def __attachCache(self):
+
+        """
+        Keep data in persistent cache entry (see ``BlockCache``), if cache is enabled. Data downloaded earlier, even
+        in previous mounts, is available instantly. Entry is chosen by YouTube id and format (``itag``) of the url, so
+        it has to be called after url is found. Only the first call has any effect. If the entry is used by another
+        object, data is kept in memory, as if cache was disabled.
+        """
+
+        cache = BlockCache.get()
+
+        if cache is None:
+            return
+
+        key = "{}-{}".format(self.yid, '+'.join(self.__itags(self.url)))
+
+        merged = isinstance(self.url, tuple)
+
+        with self.lock:
+
+            if self.cache_key is not None or self.data.closed or self.avail or self.processing_range:
+                return # already attached or something has been downloaded already.
+
+            entry = cache.open(key, None if merged else self.filesize)
+
+            if entry is None: # another object writes there.
+                return
+
+            (data, avail, filesize) = entry
+
+            if merged: # merging output is valid only as a whole.
+
+                if filesize and (0, filesize) in avail:
+                    self.filesize = filesize
+                else:
+                    avail = range_t()
+                    data.truncate(0)
+
+            self.data.close()
+
+            self.data = data
+            self.avail = avail
+            self.cache_key = key
+
+    def commitCache(self, force=False):
+
+        """
+        Save information about downloaded data in persistent cache, if ``self.data`` is a cache entry. Cache is best
+        effort, so failures are ignored.
+
+        Parameters
+        ----------
+        force : bool, optional
+            If ``False`` (default), information is saved only if it wasn't saved recently.
+        """
+
+        if self.cache_key is None:
+            return
+
+        try:
+            BlockCache.get().commit(self.cache_key, self.data, self.avail, self.filesize, self.lock, force)
+        except OSError:
+            pass
+
+    def rollover(self):
+
+        """
+        Move data kept in memory to disk. Cache entries are on disk already.
+        """
+
+        self.data.rollover(self.filesize)
+
+    def __close(self):
+
+        """
+        Close ``self.data`` and let go of cache entry. Has to be called with ``self.lock`` acquired.
+        """
+
+        if self.data.closed:
+            return
+
+        self.data.close()
+
+        if self.cache_key is not None:
+            BlockCache.get().close(self.cache_key)
+
+    def claim(self, ranges):
+
+        """
+        Claim ranges for download. Only parts of `ranges` which aren't being downloaded already are claimed, and
+        available data at both ends of every range is skipped (holes inside a range are left as ``Downloader.plan``
+        coalesced them). Has to be called with ``self.lock`` acquired.
+
+        Parameters
+        ----------
+        ranges : iterable
+            Ranges we want to download.
+
+        Returns
+        -------
+        mine : list
+            Claimed ranges. Caller has to download them with ``Downloader.fetch`` or give them back with ``release``.
+        """
+
+        mine = []
+
+        for r in ranges:
+
+            holes = list(self.avail.missing(r))
+
+            if holes:
+                mine.extend(self.processing_range.missing((holes[0][0], holes[-1][1])))
+
+        self.processing_range.update_many(mine)
+
+        return mine
+
+    def release(self, ranges):
+
+        """
+        Give back claimed ranges and wake up threads waiting for data.
+
+        Parameters
+        ----------
+        ranges : iterable
+            Ranges to release.
+        """
+
+        with self.lock:
+            self.processing_range.discard_many(r for r in ranges if r is not None)
+            self.cond.notify_all()
+
+    def registerHandler(self, fh): # Do I even need that? possible FIXME.
+
+        """
+        Register new file descriptor. If data is to be preloaded, it's downloaded now; if another thread downloads it
+        already, we just wait for it.
+
+        Parameters
+        ----------
+        fh : int
+            File descriptor.
+        """
+
+        self.fds.add(fh)
+        self.atime = int(time()) # update access time
+
+        if self.preferences['stream'] is not False:
+            return
+
+        retried = False
+
+        while True:
+
+            with self.lock:
+
+                while True:
+
+                    if (0, self.filesize) in self.avail:
+                        return
+
+                    if not self.processing_range: # nobody downloads, so we will.
+                        needed = (0, self.filesize)
+                        self.processing_range += needed # whole file is downloaded, available parts too.
+                        break
+
+                    self.cond.wait()
+
+            try:
+                Downloader.fetch(self, needed, fh)
+                return
+
+            except Downloader.UrlExpired as e:
+                if retried:
+                    raise ConnectionError
+
+                retried = True
+                self.refreshInfo(e.args[0]) # and try again, once.
+
+            except (requests.exceptions.ConnectionError, Downloader.FetchError):
+                raise ConnectionError
+
+    def __wait(self, offset, length, fh):
+
+        """
+        Make sure data is available. Method returns instantly, if it is. Otherwise data is downloaded (see
+        ``Downloader.plan``). If some of needed data is being downloaded by another thread, we wait for it instead of
+        downloading it again. If url turns out to be expired, new one is obtained and download is retried once. Returned range is added to ``reading``; caller has to remove it with ``__done``.
+
+        Parameters
+        ----------
+        offset : int
+            Read offset
+        length : int
+            Length of data to read.
+        fh : int
+            File descriptor.
+
+        Returns
+        -------
+        tuple or None
+            Range which can be read, ``None`` if reading past the end of file.
+        """
+
+        if offset >= self.filesize or length <= 0: return None # reading past the end of file.
+
+        current = (offset, min(offset + length, self.filesize))
+
+        if self.preferences['stream']:
+            self.readahead.notify(offset, length, fh)
+
+        with self.lock:
+            self.positions[fh] = offset # from now on, data we need isn't evicted.
+
+        retried = False
+
+        while True:
+
+            with self.lock:
+
+                if current in self.avail:
+                    self.reading.append(current)
+                    break
+
+                mine = self.claim(Downloader.plan(self, current))
+
+                if not mine: # everything we need is being downloaded by other threads.
+                    self.cond.wait()
+                    continue
+
+                before = self.received
+
+            done = 0
+
+            try:
+                for r in mine: # requests come in ascending order, so we download front to back.
+                    Downloader.fetch(self, r, fh) # fetch releases its range by itself.
+                    done += 1
+
+            except Downloader.UrlExpired as e:
+                if retried:
+                    raise ConnectionError
+
+                retried = True
+                self.refreshInfo(e.args[0]) # and try again, once.
+                continue
+
+            except (requests.exceptions.ConnectionError, Downloader.FetchError):
+                raise ConnectionError
+
+            finally:
+                self.release(mine[done + 1:])
+
+            with self.lock:
+                if self.received == before and current not in self.avail: # server gave us nothing.
+                    raise ConnectionError
+
+        return current
+
+    def __done(self, current):
+
+        """
+        End reading of a range returned by ``__wait`` and evict cold data, if needed (see ``Eviction``).
+
+        Parameters
+        ----------
+        current : tuple
+            Range which has been read.
+        """
+
+        with self.lock:
+            self.reading.remove(current)
+
+        Eviction.trim(self)
+
+    def read(self, offset, length, fh):
+
+        """
+        Read data. Method returns data instantly, if they're avaialable. Otherwise data is downloaded and then
+        returned. Reads of available data never wait for network nor for other reads and writes - data is served
+        from a memory map (see ``SparseStorage.view``) or read with positional I/O, without holding ``self.lock``.
+
+        Parameters
+        ----------
+        offset : int
+            Read offset
+        length : int
+            Length of data to read.
+        fh : int
+            File descriptor.
+
+        Returns
+        -------
+        bytes or ctypes.Array
+            Data read. Array is a slice of memory map, which fusepy copies to kernel buffer directly.
+        """
+
+        current = self.__wait(offset, length, fh)
+
+        if current is None:
+            return b''
+
+        try:
+            ret = self.data.view(offset, current[1] - offset)
+
+            if ret is None:
+                ret = self.data.pread(offset, current[1] - offset)
+
+        finally:
+            self.__done(current)
+
+        return ret
+
+    def clean(self):
+
+        """
+        Clear data. Explicitly close ``self.data`` if object is unused. Shared object (see ``get``) is cleaned only
+        when its last reference is dropped.
+        """
+
+        if self.registry_key is not None:
+
+            with YTStor.__registry_lock:
+
+                (yts, refs) = YTStor.__registry[self.registry_key]
+
+                if refs > 1:
+                    YTStor.__registry[self.registry_key] = (yts, refs - 1)
+                    return
+
+                del YTStor.__registry[self.registry_key]
+                self.registry_key = None
+
+        self.closing = True # schedule for closing.
+        self.readahead.stop()
+
+        if not self.fds:
+            self.commitCache(True)
+
+            with self.lock:
+                self.__close()
+
+    def unregisterHandler(self, fh):
+
+        """
+        Unregister a file descriptor. Clean data, if such operation has been scheduled.
+
+        Parameters
+        ----------
+        fh : int
+            File descriptor.
+        """
+
+        try:
+            self.fds.remove(fh)
+
+        except KeyError:
+            pass
+
+        self.readahead.forget(fh)
+
+        with self.lock:
+            self.positions.pop(fh, None)
+
+        self.commitCache(True)
+
+        self.lock.acquire()
+
+        try:
+            if self.closing and not self.fds:
+                self.__close()
+
+        finally:
+            self.lock.release()
+
+class YTEntry():
+
+    """
+    Lightweight search result. It holds only what is needed for listing a directory and getting file attributes;
+    ``YTStor`` object, which does the actual work, is obtained (see ``YTStor.get``) when the file is opened, and let go
+    after ``idle`` seconds with no open descriptors. Thanks to that, search results cost almost nothing until they're
+    opened.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``idle`` - how many seconds ``YTStor`` object is kept after the last descriptor is closed.
+    init_data : dict
+        Initial data for ``YTStor``.
+    opts : dict
+        Options for ``YTStor``.
+    stor : YTStor or None
+        Object which does the work, ``None`` if there's none at the moment.
     lock : Lock
-        Lock to sync multiple threads.
-    fds : set
-        Set of file descriptors assigned to the object.
+        Guards ``stor`` and usage state.
+    users : int
+        Number of descriptors and ``open`` calls in progress.
+    timer : Timer or None
+        Timer which will let go of ``stor``.
     closing : bool
-        ``True`` if ``data`` is scheduled for closing.
-    avail : range_t
-        Object saying how much data we have.
-    filesize : int
-        Total data size. Not yet downloaded data is also considered.
-    disk : int
-        How much data is cached on disk (8M factor).
+        ``True`` if entry has been cleaned.
+    size : int
+        Last known file size.
     extension : str
         File extension.
-    rickastley : bool
-        Make every video rickroll
-    r_session : requests.Session
-        Object that holds HTTP session. Thanks to that, we avoid useless TCP window size negotiations whenever we
-        start a download.
-    yid : str
-        YouTube id of a video which this object represents.
-    preferences : dict
-        Current object preferences.
-    url : str or tuple
-        Url to file. If tuple, then merging is needed; indices: 0: video, 1: audio.
 
     Parameters
     ----------
     init_data : dict
-        Initial data object needed for further operation. ``YTStor`` needs ``yid`` (str, YouTube video id) and
-        ``pub_date`` (video publication date as Unix timestamp).
+        Initial data, as for ``YTStor``.
     opts : dict
-        Options that will override globally set preferences.
+        Options, as for ``YTStor``.
     """
 
     preferences = {
-        "audio": True,
-        "video": True,
-        "stream": True,
-        "get_info_on_init": False
+        "idle": 60
     }
 
-    rickastley = False
+    extension = ".mp4" # FIXME
 
     def __init__(self, init_data, opts=dict()):
 
-        yid = init_data['yid'] # it must be here.
-
-        if self.rickastley:
-            yid = "dQw4w9WgXcQ" #trolololo
-
-        if not isinstance(yid, str) or len(yid) != 11:
-            raise ValueError("yid expected to be valid Youtube movie identifier") #FIXME
+        self.init_data = init_data
+        self.opts = opts
 
-        self.data = tempfile.SpooledTemporaryFile()
-        self.fds = set()
+        self.stor = None
+        self.lock = Lock()
+        self.users = 0
+        self.timer = None
         self.closing = False
-
-        self.lock = Lock() # lock to prevent threads from colliding
-
-        self.avail = range_t()
-        self.safe_range = range_t()
-        self.processing_range = range_t()
-
-        self.filesize = 4096
-        self.disk = 0
-        self.extension = ".mp4" # FIXME
+        self.size = 4096
 
         self.atime = int(time())
         try:
@@ -182,173 +1696,164 @@ class YTStor():
         except KeyError:
             self.ctime = self.atime
 
-        self.r_session = requests.Session()
+    @property
+    def filesize(self):
 
-        self.yid = yid
+        "File size; taken from ``stor``, if there is one."
 
-        _pref = deepcopy(self.preferences) # new object, just to not affect other intances.
-        try: _pref['audio'] = opts['audio']
-        except KeyError: pass
-        try: _pref['video'] = opts['video']
-        except KeyError: pass
-        try: _pref['format'] = opts['format']
-        except KeyError: pass
-        try: _pref['stream'] = opts['stream']
-        except KeyError: pass
-        try: _pref['get_info_on_init'] = opts['get_info_on_init']
-        except KeyError: pass
-        self.preferences = _pref
+        stor = self.stor
 
-        self.ytdl = youtube_dl.YoutubeDL({"quiet": True, "format": "bestvideo+bestaudio"})
-        self.ytdl.add_info_extractor( self.ytdl.get_info_extractor("Youtube"))
+        if stor is not None:
+            self.size = stor.filesize
 
-    def obtainInfo(self):
+        return self.size
+
+    def __acquire(self):
 
         """
-        Method for obtaining information about the movie.
+        Obtain ``stor`` for a new user.
+
+        Returns
+        -------
+        YTStor
+            Object which does the work.
         """
 
-        try:
-            info = self.ytdl.extract_info(self.yid, download=False)
-        except youtube_dl.utils.DownloadError:
-            raise ConnectionError
+        with self.lock:
 
-        if not self.preferences['stream']:
-            self.url = (info['requested_formats'][0]['url'], info['requested_formats'][1]['url'])
-            return True
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
 
-        # else:
-        for f in info['formats']:
-            if 'filesize' not in f or not f['filesize']:
-                f['filesize'] = float('inf') # next line won't fail, infinity, because unknown filesize is the least preferred
+            if self.stor is None:
+                self.stor = YTStor.get(self.init_data, self.opts)
 
-        # - for easy sorting - we'll get best quality and lowest filsize
-        aud = {(-int(f['abr']),    f['filesize'], f['url']) for f in info['formats'] if f.get('abr') and not f.get('height')}
-        vid = {(-int(f['height']), f['filesize'], f['url']) for f in info['formats'] if not f.get('abr') and f.get('height')}
-        full= {(-int(f['height']), f['filesize'], f['url']) for f in info['formats'] if f.get('abr') and f.get('height')}
+            self.users += 1
 
-        try:
-            _f = int( self.preferences.get('format') ) # if valid format is present, then choose closes value
-            _k = lambda x: abs(x[0] + _f) # +, because x[0] is negative
+            return self.stor
 
-        except (ValueError, TypeError):
-            _k = lambda d: d
+    def __release(self):
+
+        """
+        User is gone. If it was the last one, ``stor`` is let go of after ``idle`` seconds.
+        """
 
-        if self.preferences['audio'] and self.preferences['video']: fm = sorted(full, key=_k)
-        elif self.preferences['audio']: fm = sorted(aud, key=_k)
-        elif self.preferences['video']: fm = sorted(vid, key=_k)
+        with self.lock:
 
-        filesize = 0
-        i = -1
+            self.users -= 1
 
-        try:
-            while filesize == 0: # some videos are problematic, we will try to find format with non-zero filesize
+            if self.users or self.closing or self.stor is None:
+                return
 
-                i += 1
+            timer = Timer(self.preferences['idle'], lambda: self.__expire(timer))
+            timer.daemon = True
+            timer.start()
 
-                self.url = fm[i][2]
-                if fm[i][1] == float('inf'):
-                    filesize = int(self.r_session.head(self.url).headers['content-length'])
-                else:
-                    filesize = int(fm[i][1])
+            self.timer = timer
 
-        except IndexError: # finding filesize failed for every format
+    def __expire(self, timer):
 
-            self.url = (info['requested_formats'][0]['url'], info['requested_formats'][1]['url'])
-            self.preferences['stream'] = False # hopefully non-stream download will work
+        """
+        Let go of ``stor``, if it's still unused.
+
+        Parameters
+        ----------
+        timer : Timer
+            Timer which fired. If it's not the current one, entry has been used in the meantime.
+        """
 
-            return True
+        with self.lock:
 
-        self.filesize = filesize
+            if self.timer is not timer or self.users:
+                return
 
-        return True
+            self.size = self.stor.filesize
+            stor = self.stor
+            self.stor = None
+            self.timer = None
 
-    def registerHandler(self, fh): # Do I even need that? possible FIXME.
+        stor.clean()
+
+    def warm(self):
 
         """
-        Register new file descriptor.
+        Obtain information about the movie in background, before the file is opened, so real file size is known and
+        opening is fast. Information goes to ``InfoCache`` (see ``YTStor.warm``), no ``YTStor`` object is created.
+        Errors are ignored - they'll be reported by ``open``.
+        """
+
+        if self.closing:
+            return
+
+        try:
+            info = YTStor.warm(self.init_data, self.opts)
+        except Exception:
+            return
+
+        if info['filesize'] is not None:
+            self.size = info['filesize']
+
+    def obtainInfo(self):
 
-        Parameters
-        ----------
-        fh : int
-            File descriptor.
         """
+        Obtain ``stor`` and information about the movie. Called by ``open``, before ``registerHandler``.
 
-        self.fds.add(fh)
-        self.atime = int(time()) # update access time
+        Returns
+        -------
+        bool
+            Result of ``YTStor.obtainInfo``.
+        """
 
-        self.lock.acquire()
+        stor = self.__acquire()
 
         try:
-            if (0, self.filesize) not in self.avail and self.preferences['stream'] is False:
-
-                Downloader.fetch(self, None, fh) # lock forces other threads to wait, so fetch will perform just once.
-        except requests.exceptions.ConnectionError:
-            raise ConnectionError
+            return stor.obtainInfo()
 
         finally:
-            self.lock.release()
+            self.__release() # registerHandler acquires again, descriptor counts from now on.
 
-    def read(self, offset, length, fh):
+    def registerHandler(self, fh):
 
         """
-        Read data. Method returns data instantly, if they're avaialable and in ``self.safe_range``. Otherwise data is
-        downloaded and then returned.
+        Register new file descriptor.
 
         Parameters
         ----------
-        offset : int
-            Read offset
-        length : int
-            Length of data to read.
         fh : int
             File descriptor.
         """
 
-        current = (offset, offset + length)
-
-        safe = [ current[0] - ( 8 * length ), current[1] + ( 16 * length ) ]
-        if safe[0] < 0: safe[0] = 0
-        if safe[1] > self.filesize: safe[1] = self.filesize
-        safe = tuple(safe)
-
-        self.lock.acquire()
+        self.atime = int(time())
+        stor = self.__acquire()
 
         try:
-            dl = range_t({safe}) - self.avail
-
-            for r in dl.toset():
-                try:
-                    Downloader.fetch(self, r, fh) # download is, let's say, atomic thanks to lock
-                except requests.exceptions.ConnectionError:
-                    raise ConnectionError
-
-            if self.disk + 1 < len(self.avail):
-
-                self.data.rollover()
-                self.disk += 1
-
-        finally:
-            self.lock.release()
+            stor.registerHandler(fh)
 
-        self.data.seek(offset)
-        return self.data.read(length) #FIXME - error handling
+        except Exception:
+            self.__release()
+            raise
 
-    def clean(self):
+    def read(self, offset, length, fh):
 
         """
-        Clear data. Explicitly close ``self.data`` if object is unused.
-        """
+        Read data. See ``YTStor.read``.
 
-        self.closing = True # schedule for closing.
+        Parameters
+        ----------
+        offset : int
+            Read offset.
+        length : int
+            Length of data to read.
+        fh : int
+            File descriptor.
+        """
 
-        if not self.fds:
-            self.data.close()
+        return self.stor.read(offset, length, fh)
 
     def unregisterHandler(self, fh):
 
         """
-        Unregister a file descriptor. Clean data, if such operation has been scheduled.
+        Unregister a file descriptor.
 
         Parameters
         ----------
@@ -356,37 +1861,82 @@ class YTStor():
             File descriptor.
         """
 
-        try:
-            self.fds.remove(fh)
+        self.stor.unregisterHandler(fh)
+        self.__release()
 
-        except KeyError:
-            pass
+    def clean(self):
 
-        self.lock.acquire()
+        """
+        Clear data. ``stor`` is let go of; it's cleaned when open descriptors are closed.
+        """
 
-        try:
-            self.data.rollover() # rollover data on close.
+        with self.lock:
 
-        finally:
-            self.lock.release()
+            if self.closing:
+                return
+
+            self.closing = True
+
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            stor = self.stor
+
+        if stor is not None:
+            stor.clean() # descriptors still open keep using it.
 
-        if self.closing and not self.fds:
-            self.data.close()
 
 class YTMetaStor():
 
     """
     Class that holds metadata in a seperate file. Should always correspond to existing *Stor object, though this
     relation isn't held anywhere in *Stor objects, they'll just share a filename, but with different extensions.
+
+    Descriptions are built from search results. Thumbnails are downloaded lazily - when the file is opened or it's
+    warmed up (see ``warm``) - and dropped from memory after ``idle`` seconds with no open descriptors; their size
+    stays known. If ``MetaCache`` is enabled, thumbnails are taken from there, so each one is
+    downloaded once, whatever number of searches and mounts it appears in.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``idle`` - how many seconds downloaded data is kept after the last descriptor is closed.
+    data : bytes or None
+        File contents, ``None`` if not downloaded (or dropped).
+    url : str or None
+        Url of data to download, ``None`` for descriptions.
+    cache_name : str or None
+        Name of file in ``MetaCache``, ``None`` if data isn't cached.
+    size : int or None
+        File size, ``None`` if not known yet.
+    lock : Lock
+        Guards object state; held during download, so data is downloaded once.
+    users : int
+        Number of open descriptors.
+    timer : Timer or None
+        Timer which will drop data.
+
+    Parameters
+    ----------
+    init_data : dict
+        For descriptions: ``title``, ``yid``, ``desc``, ``channel`` and ``pub_date``; for thumbnails: ``url``,
+        ``pub_date`` and optionally ``yid`` (needed for caching).
+    opts : dict
+        Ignored.
     """
 
-    # TODO: docs
+    preferences = {
+        "idle": 60
+    }
 
     extension = ""
 
     def __init__(self, init_data, opts=dict()):
 
-        self.data = BytesIO()
+        self.lock = Lock()
+        self.users = 0
+        self.timer = None
 
         self.atime = int(time())
         try:
@@ -397,28 +1947,167 @@ class YTMetaStor():
 
         if not init_data.get('url'):
 
-            self.data.write(bytes(init_data['title'], 'utf-8') + b" [" + bytes(init_data['yid'], 'utf-8')
+            self.data = (bytes(init_data['title'], 'utf-8') + b" [" + bytes(init_data['yid'], 'utf-8')
                     + b"]\nby: " + bytes(init_data['channel'], 'utf-8') + b" at: "
                     + bytes(init_data['pub_date'], 'utf-8') + b"\n\n" + bytes(init_data['desc'], 'utf-8') + b"\n")
 
             self.url = None
+            self.size = len(self.data)
+            self.cache_name = None
 
         else:
-            url = init_data['url']
-            self.data.write(requests.get(url).content)
+            self.data = None
+            self.url = init_data['url']
+            self.size = None
+            self.cache_name = init_data['yid'] + ".jpg" if init_data.get('yid') else None
+
+    @property
+    def filesize(self):
+
+        """
+        File size. If it's not known yet, 4096 is reported (as ``YTEntry`` does), so listing a directory downloads
+        nothing; real size is known once data is downloaded - on open, read or warm-up. Thumbnails are opened with
+        ``direct_io``, so reads aren't cut at the reported size.
+        """
+
+        if self.size is None and self.cache_name is not None and MetaCache.get() is not None:
+            self.size = MetaCache.get().size(self.cache_name) # no need to read it.
+
+        if self.size is None:
+            return 4096
+
+        return self.size
+
+    def __load(self):
+
+        """
+        Download data, if it's not in memory.
+
+        Returns
+        -------
+        bytes
+            Data.
+
+        Raises
+        ------
+        ConnectionError
+            When download fails.
+        """
+
+        with self.lock:
+
+            if self.data is not None:
+                return self.data
+
+            cache = MetaCache.get() if self.cache_name is not None else None
+
+            if cache is not None:
+                self.data = cache.load(self.cache_name)
 
-        self.filesize = self.data.tell()
+            if self.data is None:
+
+                try:
+                    get = SharedSession.get().get(self.url)
+                    get.raise_for_status()
+                except requests.exceptions.RequestException:
+                    raise ConnectionError
+
+                self.data = get.content
+
+                if cache is not None:
+                    cache.store(self.cache_name, self.data)
+
+            self.size = len(self.data)
+
+            return self.data
+
+    def __idle(self):
+
+        """
+        Drop downloaded data after ``idle`` seconds, if nobody uses it.
+        """
+
+        with self.lock:
+
+            if self.url is None or self.users or self.timer is not None:
+                return
+
+            timer = Timer(self.preferences['idle'], lambda: self.__drop(timer))
+            timer.daemon = True
+            timer.start()
+
+            self.timer = timer
+
+    def __drop(self, timer):
+
+        """
+        Drop downloaded data, if it's still unused.
+
+        Parameters
+        ----------
+        timer : Timer
+            Timer which fired. If it's not the current one, data has been used in the meantime.
+        """
+
+        with self.lock:
+
+            if self.timer is timer and not self.users:
+                self.data = None
+                self.timer = None
+
+    def warm(self):
+
+        """
+        Download data in background, before the file is opened. Errors are ignored - they'll be reported by ``open``.
+        """
+
+        try:
+            self.__load()
+            self.__idle()
+        except ConnectionError:
+            pass
 
     def obtainInfo(self):
-        "Just return."
+
+        """
+        Make sure data is available.
+
+        Returns
+        -------
+        bool
+            ``True``.
+
+        Raises
+        ------
+        ConnectionError
+            When download fails.
+        """
+
+        self.__load()
+
         return True
 
     def registerHandler(self, fh):
 
-        "Update atime."
+        """
+        Register a descriptor and update atime.
+
+        Parameters
+        ----------
+        fh : int
+            File descriptor.
+        """
 
         self.atime = int(time())
 
+        with self.lock:
+
+            self.users += 1
+
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
     def read(self, offset, length, fh):
 
         """
@@ -434,17 +2123,35 @@ class YTMetaStor():
             File descriptor, ignored.
         """
 
-        self.data.seek(offset)
-        return self.data.read(length)
+        return self.__load()[offset:offset + length]
 
     def clean(self):
 
         """
-        Close file-like object.
+        Drop data.
         """
 
-        self.data.close()
+        with self.lock:
+
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+            if self.url is not None:
+                self.data = None
 
     def unregisterHandler(self, fh):
-        "Just pass."
-        pass
+
+        """
+        Unregister a descriptor. Data is dropped after ``idle`` seconds, if no descriptors are left.
+
+        Parameters
+        ----------
+        fh : int
+            File descriptor.
+        """
+
+        with self.lock:
+            self.users -= 1
+
+        self.__idle()
@@ -0,0 +1,618 @@
+"""
+Module that provides storage for downloaded data, which can be read and written concurrently by many threads.
+"""
+
+import os
+import mmap
+import ctypes
+import ctypes.util
+import tempfile
+from ctypes import c_char, c_int, c_longlong
+from collections import OrderedDict
+from threading import Lock
+
+FALLOC_FL_KEEP_SIZE = 0x01
+FALLOC_FL_PUNCH_HOLE = 0x02
+
+def _fallocate():
+
+    """
+    Find ``fallocate`` function of C library.
+
+    Returns
+    -------
+    callable or None
+        ``fallocate``, ``None`` if it's not available (it's Linux specific).
+    """
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fallocate = libc.fallocate
+
+    except (OSError, AttributeError):
+        return None
+
+    fallocate.argtypes = [c_int, c_int, c_longlong, c_longlong]
+    fallocate.restype = c_int
+
+    return fallocate
+
+fallocate = _fallocate()
+
+class SparseStorage():
+
+    """
+    Storage on a sparse file. Data is accessed with positional I/O (``os.pread``/``os.pwrite``), which doesn't use the
+    file position, so any number of readers and writers work on the file at once, with no lock held during I/O. File
+    is extended to its final size up front; since it's sparse, no disk space is used for data not written yet.
+
+    Storage can be closed while other threads still use it; file is actually closed when the last of them finishes,
+    so a descriptor is never closed (and possibly reused for other file) under a running operation.
+
+    Data can also be read without copying, straight from a memory map of the file (see ``view``).
+
+    Attributes
+    ----------
+    preferences : dict
+        ``mmap`` - if ``True``, ``view`` serves data from a memory map.
+    file : file
+        Underlying file object.
+    lock : Lock
+        Guards ``users``, ``closed`` and ``map``. Never held during I/O.
+    map : mmap or None
+        Current memory map of the file, ``None`` if file hasn't been mapped yet.
+    punchable : bool
+        ``False`` if punching holes isn't supported by the system or the filesystem.
+    users : int
+        Number of operations in progress.
+    closed : bool
+        ``True`` if storage has been closed.
+
+    Parameters
+    ----------
+    file : file
+        File object opened for reading and writing. Storage takes ownership of it.
+    size : int or None, optional
+        Final size of data, if known.
+    """
+
+    preferences = {
+        "mmap": True
+    }
+
+    def __init__(self, file, size=None):
+
+        self.file = file
+        self.lock = Lock()
+        self.users = 0
+        self.closed = False
+        self.map = None
+        self.punchable = fallocate is not None
+
+        if size is not None:
+            self.truncate(size)
+
+    def _enter(self):
+
+        """
+        Mark start of an operation.
+
+        Returns
+        -------
+        bool
+            ``False`` if storage is closed and operation must not be done.
+        """
+
+        with self.lock:
+
+            if self.closed:
+                return False
+
+            self.users += 1
+            return True
+
+    def _exit(self):
+
+        """
+        Mark end of an operation. Close file if storage has been closed in the meantime.
+        """
+
+        with self.lock:
+
+            self.users -= 1
+
+            if self.closed and not self.users:
+                self.file.close()
+
+    def _pread(self, offset, length):
+        return os.pread(self.file.fileno(), length, offset)
+
+    def _pwrite(self, offset, data):
+
+        fd = self.file.fileno()
+        view = memoryview(data)
+
+        while view:
+            n = os.pwrite(fd, view, offset)
+            offset += n
+            view = view[n:]
+
+    def pread(self, offset, length):
+
+        """
+        Read data.
+
+        Parameters
+        ----------
+        offset : int
+            Read offset.
+        length : int
+            Length of data to read.
+
+        Returns
+        -------
+        bytes
+            Data read, empty if storage is closed.
+        """
+
+        if not self._enter():
+            return b''
+
+        try:
+            return self._pread(offset, length)
+        finally:
+            self._exit()
+
+    def _remap(self, end):
+
+        """
+        Map the whole file again, if current map ends before `end`. Has to be called between ``_enter`` and ``_exit``.
+        Old map is not closed - arrays returned by ``view`` keep it alive until they're freed.
+
+        Returns
+        -------
+        mmap or None
+            Map which covers `end`, ``None`` if the file is shorter.
+        """
+
+        with self.lock:
+
+            if self.map is None or len(self.map) < end:
+
+                fd = self.file.fileno()
+                size = os.fstat(fd).st_size
+
+                if size < end:
+                    return None
+
+                self.map = mmap.mmap(fd, size) # ctypes needs a writable buffer, though we never write through it.
+
+            return self.map
+
+    def view(self, offset, length):
+
+        """
+        Read data without copying. Data is returned as a ctypes array backed by a memory map of the file, which can be
+        handed to fusepy as it is - the only copy made is fusepy's ``memmove`` to the kernel buffer. As the file grows,
+        it's mapped again.
+
+        Parameters
+        ----------
+        offset : int
+            Read offset.
+        length : int
+            Length of data to read. Whole range has to be within the file.
+
+        Returns
+        -------
+        ctypes.Array or None
+            Data, ``None`` if it can't be served from a map (mapping is disabled, storage is closed or data is beyond
+            the end of file) - ``pread`` has to be used then.
+        """
+
+        if not self.preferences['mmap'] or length <= 0:
+            return None
+
+        m = self.map
+
+        if m is None or len(m) < offset + length:
+
+            if not self._enter():
+                return None
+
+            try:
+                m = self._remap(offset + length)
+            finally:
+                self._exit()
+
+            if m is None:
+                return None
+
+        return (c_char * length).from_buffer(m, offset)
+
+    def pwrite(self, offset, data):
+
+        """
+        Write data.
+
+        Parameters
+        ----------
+        offset : int
+            Write offset.
+        data : bytes
+            Data to write.
+
+        Returns
+        -------
+        bool
+            ``False`` if storage is closed and nothing was written.
+        """
+
+        if not self._enter():
+            return False
+
+        try:
+            self._pwrite(offset, data)
+            return True
+        finally:
+            self._exit()
+
+    def truncate(self, size):
+
+        """
+        Change file size. Space added at the end is a hole, it reads as zeros.
+
+        Parameters
+        ----------
+        size : int
+            New size.
+        """
+
+        if not self._enter():
+            return
+
+        try:
+            with self.lock:
+                self.map = None # don't serve data from beyond the new end.
+
+            self.file.truncate(size)
+        finally:
+            self._exit()
+
+    def sync(self):
+
+        """
+        Make sure written data is on disk.
+
+        Returns
+        -------
+        bool
+            ``False`` if storage is closed.
+        """
+
+        if not self._enter():
+            return False
+
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            return True
+        finally:
+            self._exit()
+
+    def rollover(self, size=None):
+
+        """
+        Move data kept in memory to disk. Data of ``SparseStorage`` is always on disk, so it does nothing.
+        """
+
+        pass
+
+    def can_punch(self):
+
+        """
+        Check if ``punch`` can free space.
+
+        Returns
+        -------
+        bool
+            ``True`` if holes can be punched.
+        """
+
+        return self.punchable and not self.closed
+
+    def punch(self, ranges):
+
+        """
+        Free disk space used by data, by punching holes in the file (``fallocate`` with ``FALLOC_FL_PUNCH_HOLE``). File
+        size doesn't change; punched ranges read as zeros. If filesystem doesn't support it, holes aren't punched from
+        now on.
+
+        Parameters
+        ----------
+        ranges : iterable
+            Ranges to free. Nobody may read them anymore.
+
+        Returns
+        -------
+        bool
+            ``True`` if all holes were punched.
+        """
+
+        if not self.can_punch() or not self._enter():
+            return False
+
+        try:
+            fd = self.file.fileno()
+
+            for (start, end) in ranges:
+
+                if fallocate(fd, FALLOC_FL_PUNCH_HOLE | FALLOC_FL_KEEP_SIZE, start, end - start):
+                    self.punchable = False # e.g. EOPNOTSUPP - don't try again.
+                    return False
+
+            return True
+
+        finally:
+            self._exit()
+
+    def close(self):
+
+        """
+        Close storage. File is closed when operations in progress end.
+        """
+
+        with self.lock:
+
+            if self.closed:
+                return
+
+            self.closed = True
+            self.map = None # arrays returned by view keep their map alive.
+
+            if not self.users:
+                self.file.close()
+
+
+class MemoryBudget():
+
+    """
+    Mount-wide budget of memory used by ``SpooledStorage`` objects. Every storage reports how much memory it uses
+    after each write, and each read marks it as recently used. When total usage exceeds the budget, least recently
+    used storages are moved to disk, so small files which are read often stay in memory, and big or abandoned ones
+    don't take more memory than allowed.
+
+    Attributes
+    ----------
+    preferences : dict
+        ``size`` - memory budget in bytes.
+    lock : Lock
+        Guards budget state.
+    used : OrderedDict
+        Memory used by every storage kept in memory, least recently used first.
+    total : int
+        Sum of ``used`` values.
+    spilled : int
+        How many storages have been moved to disk because of the budget.
+    """
+
+    preferences = {
+        "size": 1 << 28 # 256 MiB
+    }
+
+    __instance = None
+    __instance_lock = Lock()
+
+    @classmethod
+    def get(cls):
+
+        """
+        Obtain the budget. It is created on first use, with preferences set at that moment.
+
+        Returns
+        -------
+        MemoryBudget
+            The budget.
+        """
+
+        with cls.__instance_lock:
+
+            if cls.__instance is None:
+                cls.__instance = cls()
+
+            return cls.__instance
+
+    def __init__(self):
+
+        self.lock = Lock()
+        self.used = OrderedDict()
+        self.total = 0
+        self.spilled = 0
+
+    def update(self, storage, size):
+
+        """
+        Report memory used by a storage and mark it as the most recently used one. If the budget is exceeded, least
+        recently used storages are moved to disk.
+
+        Parameters
+        ----------
+        storage : SpooledStorage
+            Storage which reports.
+        size : int
+            Memory used by `storage`.
+        """
+
+        with self.lock:
+
+            if not storage.spooled: # moved to disk in the meantime.
+                return
+
+            self.total += size - self.used.pop(storage, 0)
+            self.used[storage] = size
+
+            victims = []
+            total = self.total
+
+            for (s, n) in self.used.items():
+
+                if total <= self.preferences['size']:
+                    break
+
+                victims.append(s)
+                total -= n
+
+            self.spilled += len(victims)
+
+        for s in victims: # rollover calls forget, so it's done without the lock.
+            s.rollover()
+
+    def touch(self, storage):
+
+        """
+        Mark a storage as the most recently used one.
+
+        Parameters
+        ----------
+        storage : SpooledStorage
+            Storage which has been read.
+        """
+
+        with self.lock:
+            if storage in self.used:
+                self.used.move_to_end(storage)
+
+    def forget(self, storage):
+
+        """
+        Stop tracking a storage, when it's moved to disk or closed.
+
+        Parameters
+        ----------
+        storage : SpooledStorage
+            Storage to forget.
+        """
+
+        with self.lock:
+            self.total -= self.used.pop(storage, 0)
+
+    def stats(self):
+
+        """
+        Budget statistics.
+
+        Returns
+        -------
+        dict
+            ``size`` - budget, ``used`` - memory in use, ``storages`` - number of storages kept in memory,
+            ``spilled`` - number of storages moved to disk because of the budget.
+        """
+
+        with self.lock:
+            return {"size": self.preferences['size'], "used": self.total, "storages": len(self.used),
+                    "spilled": self.spilled}
+
+
+class SpooledStorage(SparseStorage):
+
+    """
+    Storage kept in memory until ``rollover``, then moved to a sparse temporary file. In memory, operations are
+    serialized by ``lock`` (``SpooledTemporaryFile`` has only one file position); after rollover, they use positional
+    I/O just like ``SparseStorage``. Memory used by all storages is limited by ``MemoryBudget``, which calls
+    ``rollover`` when needed.
+
+    Attributes
+    ----------
+    spooled : bool
+        ``True`` while data is kept in memory.
+    memory : int
+        Memory used by data - data is kept in a contiguous buffer, so it's the end of the furthest write.
+    """
+
+    def __init__(self):
+
+        super().__init__(tempfile.SpooledTemporaryFile())
+        self.spooled = True
+        self.memory = 0
+
+    def _pread(self, offset, length):
+
+        ret = None
+
+        if self.spooled:
+            with self.lock:
+                if self.spooled:
+                    self.file.seek(offset)
+                    ret = self.file.read(length)
+
+        if ret is None:
+            return super()._pread(offset, length)
+
+        MemoryBudget.get().touch(self)
+
+        return ret
+
+    def _pwrite(self, offset, data):
+
+        size = None
+
+        if self.spooled and offset + len(data) > MemoryBudget.preferences['size']: # would never fit.
+            self.rollover()
+
+        if self.spooled:
+            with self.lock:
+                if self.spooled:
+                    self.file.seek(offset)
+                    self.file.write(data)
+                    self.memory = size = max(self.memory, offset + len(data))
+
+        if size is None:
+            super()._pwrite(offset, data)
+        else:
+            MemoryBudget.get().update(self, size) # may move us to disk, so it's done without the lock.
+
+    def view(self, offset, length):
+
+        if self.spooled: # nothing to map yet.
+            return None
+
+        return super().view(offset, length)
+
+    def can_punch(self):
+
+        return not self.spooled and super().can_punch() # memory can't be punched.
+
+    def rollover(self, size=None):
+
+        """
+        Move data from memory to a sparse temporary file. Further operations use positional I/O.
+
+        Parameters
+        ----------
+        size : int or None, optional
+            Final size of data, if known. File is extended to it, if it's smaller.
+        """
+
+        if not self._enter():
+            return
+
+        try:
+            with self.lock:
+
+                if self.spooled:
+                    self.file.rollover()
+                    self.file.flush()
+                    self.spooled = False
+
+            MemoryBudget.get().forget(self)
+
+            if size is not None and size > os.fstat(self.file.fileno()).st_size: # only extend, never cut data.
+                self.truncate(size)
+
+        finally:
+            self._exit()
+
+    def close(self):
+
+        super().close()
+        MemoryBudget.get().forget(self)
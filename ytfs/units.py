@@ -0,0 +1,33 @@
+"""
+Module with helpers for units used on command line. It has no dependencies, so scripts in ``bench`` can use it too.
+"""
+
+from argparse import ArgumentTypeError
+
+def size_arg(s):
+
+    """
+    Convert size given on command line to number of bytes. ``K``, ``M`` and ``G`` suffixes (powers of 1024) are
+    accepted, e.g. ``512K`` or ``2M``.
+
+    Parameters
+    ----------
+    s : str
+        Size to convert.
+
+    Returns
+    -------
+    int
+        Size in bytes.
+    """
+
+    mul = {'K': 1 << 10, 'M': 1 << 20, 'G': 1 << 30}
+
+    try:
+        if s[-1:].upper() in mul:
+            return int(float(s[:-1]) * mul[s[-1].upper()])
+
+        return int(s)
+
+    except ValueError:
+        raise ArgumentTypeError("invalid size: " + repr(s))
@@ -13,14 +13,23 @@ import errno
 import math
 from enum import Enum
 from copy import deepcopy
-from time import time
+from time import time, sleep
+from threading import Thread
 from argparse import ArgumentParser, HelpFormatter
 from functools import wraps
 
 from fuse import FUSE, FuseOSError, Operations
 
 #from stor import YTStor
-from .actions import YTActions, YTStor, YTMetaStor
+from .actions import YTActions, YTEntry, YTMetaStor
+from .stor import YTStor, Downloader, ReadAhead, Eviction
+from .session import SharedSession
+from .scheduler import Scheduler
+from .cache import BlockCache, MetaCache
+from .storage import SparseStorage, MemoryBudget
+from .extractor import ExtractorPool
+from .infocache import InfoCache
+from .units import size_arg
 
 
 #######################
@@ -60,6 +69,24 @@ def flush_FIX(self, path, fip): # if feel bad...
 
 FUSE.flush = flush_FIX # It's just wrong...
 
+def open_FIX(self, path, fip):
+
+    fi = fip.contents
+
+    if self.raw_fi:
+        return self.operations('open', path.decode(self.encoding), fi)
+
+    fi.fh = self.operations('open', path.decode(self.encoding), fi.flags)
+
+    # thumbnail size isn't known before download, so a placeholder is reported. Kernel would cut reads at it, unless
+    # they go directly to us.
+    yts = self.operations.fds.get(fi.fh) if isinstance(self.operations, YTFS) else None
+    fi.direct_io = isinstance(yts, YTMetaStor) and yts.url is not None # <= added
+
+    return 0
+
+FUSE.open = open_FIX
+
 #######################
 
 
@@ -84,8 +111,8 @@ class fd_dict(dict):
             File descriptor.
         """
 
-        if not isinstance(yts, (YTStor, YTMetaStor, type(None))):
-            raise TypeError("Expected YTStor object, YTMetaStor object or None.")
+        if not isinstance(yts, (YTStor, YTEntry, YTMetaStor, type(None))):
+            raise TypeError("Expected YTStor object, YTEntry object, YTMetaStor object or None.")
 
         k = 0
         while k in self.keys():
@@ -608,7 +635,7 @@ class YTFS(Operations):
 
         Returns
         -------
-        bytes
+        bytes or ctypes.Array
             Movie data.
         """
 
@@ -697,6 +724,38 @@ class YTFS(Operations):
         return 0
 
 
+def stats():
+
+    """
+    Statistics of components shared by the whole process, for debugging.
+
+    Returns
+    -------
+    str
+        Statistics, one component per line.
+    """
+
+    return "\n".join([
+        "connections: {}".format(SharedSession.stats()),
+        "downloads (foreground, prefetch, bulk): {}".format(Scheduler.get().stats()),
+        "merging: {}".format(YTStor.merges())
+    ])
+
+def report(interval):
+
+    """
+    Print statistics to stderr every `interval` seconds. Used in debug mode.
+
+    Parameters
+    ----------
+    interval : float
+        Seconds between reports.
+    """
+
+    while True:
+        sleep(interval)
+        print(stats(), file=sys.stderr, flush=True)
+
 def main():
 
     parser = ArgumentParser(description="YTFS - YouTube Filesystem: search and play materials from YouTube using filesystem operations.", epilog="Streaming may not work if your player will read whole file into its buffer.", prog="ytfs", formatter_class=lambda prog: HelpFormatter(prog, max_help_position=50))
@@ -711,13 +770,29 @@ def main():
 
     s_grp = parser.add_mutually_exclusive_group()
     s_grp.add_argument('-P', action='store_true', default=False, help="Always download whole data before reading. Useful for obtaining heighest video quality.")
-    parser.add_argument('-d', action='store_true', default=False, help="debug: run in foreground")
+    parser.add_argument('-d', action='store_true', default=False, help="debug: run in foreground, print statistics every minute")
     parser.add_argument('-m', default="", help="Metadata to fetch. Values: `desc` for descriptions, `thumb` for thumbnails. Use comma (,) for separating multiple values.", metavar="META1[,META2[,...]]")
 
     avgrp.add_argument('-o', choices=['date', 'rating', 'relevance', 'title', 'viewCount'], default='relevance',
                         help='Specify the method that will be used to order resources. Values: `date`, `rating`, `relevance`, `title` and `viewCount`. Default is relevance.')
     parser.add_argument('--allow-other', action='store_true', default=False, help="Allow other users to access the filesystem. For this to work, you'll need to set 'user_allow_other' in /etc/fuse.conf. You will need this setting if you want to share YTFS over network (SMB, NFS, etc).")
     parser.add_argument('--youtube-api-key', type=str, help="Specify the YouTube Data API v3 key to use. By default a library key will be used.")
+    parser.add_argument('--readahead', type=size_arg, default=None, help="How much data to download in background in front of sequential reads. 0 disables read-ahead. Default is 8M.", metavar="SIZE")
+    parser.add_argument('--readahead-time', type=float, default=None, help="Download at least this many seconds of the movie in front of sequential reads.", metavar="SECONDS")
+    parser.add_argument('--max-downloads', type=int, default=None, help="Maximum number of simultaneous downloads. Default is 16.", metavar="N")
+    parser.add_argument('--max-file-downloads', type=int, default=None, help="Maximum number of simultaneous downloads for one file. Default is 8.", metavar="N")
+    parser.add_argument('--rate', type=size_arg, default=None, help="Global download bandwidth limit, in bytes per second. Unlimited by default.", metavar="SIZE")
+    parser.add_argument('--file-rate', type=size_arg, default=None, help="Download bandwidth limit for one file, in bytes per second. Unlimited by default.", metavar="SIZE")
+    parser.add_argument('--connections', type=int, default=None, help="Maximum number of simultaneous connections to one host. Default is 16.", metavar="N")
+    parser.add_argument('--segments', type=int, default=None, help="Number of parallel connections used to preload data (-P). Default is 8.", metavar="N")
+    parser.add_argument('--block-size', type=size_arg, default=None, help="Streaming downloads are aligned to blocks of this size. Default is 2M.", metavar="SIZE")
+    parser.add_argument('--warm-up', type=int, default=None, help="Obtain information about search results (and download thumbnails) in background with this many threads, so file sizes are known and files open quickly. Disabled by default.", metavar="N")
+    parser.add_argument('--extractors', type=int, default=None, help="Maximum number of movie information extractions running at once. Default is 4.", metavar="N")
+    parser.add_argument('--keep-behind', type=size_arg, default=None, help="Free disk space used by data this far behind every reader of a file. Data is downloaded again if needed. Disabled by default.", metavar="SIZE")
+    parser.add_argument('--memory', type=size_arg, default=None, help="How much memory can be used for keeping downloaded data. Least recently read files are moved to disk, when it's exceeded. Default is 256M.", metavar="SIZE")
+    parser.add_argument('--no-mmap', action='store_true', default=False, help="Copy data read from files instead of serving it from memory maps.")
+    parser.add_argument('--cache-dir', type=str, default=None, help="Keep downloaded data in this directory, so it survives unmounting. Disabled by default.", metavar="PATH")
+    parser.add_argument('--cache-size', type=size_arg, default=None, help="Maximum size of data kept in cache directory. Least recently used movies are removed first. Default is 10G.", metavar="SIZE")
 
     x = parser.parse_args()
 
@@ -736,6 +811,56 @@ def main():
     if x.P:
         YTStor.preferences['stream'] = False
 
+    if x.block_size:
+        Downloader.preferences['block_size'] = x.block_size
+
+    if x.max_downloads:
+        Scheduler.preferences['concurrency'] = x.max_downloads
+
+    if x.max_file_downloads:
+        Scheduler.preferences['per_file'] = x.max_file_downloads
+
+    if x.rate:
+        Scheduler.preferences['rate'] = x.rate
+
+    if x.file_rate:
+        Scheduler.preferences['file_rate'] = x.file_rate
+
+    if x.connections:
+        SharedSession.preferences['per_host'] = x.connections
+
+    if x.segments:
+        Downloader.preferences['segments'] = x.segments
+
+    if x.readahead is not None:
+        ReadAhead.preferences['size'] = x.readahead
+
+    if x.readahead_time is not None:
+        ReadAhead.preferences['time'] = x.readahead_time
+
+    if x.warm_up:
+        YTActions.preferences['warmup'] = x.warm_up
+
+    if x.extractors:
+        ExtractorPool.preferences['size'] = x.extractors
+
+    if x.keep_behind:
+        Eviction.preferences['keep'] = x.keep_behind
+
+    if x.memory is not None:
+        MemoryBudget.preferences['size'] = x.memory
+
+    if x.no_mmap:
+        SparseStorage.preferences['mmap'] = False
+
+    if x.cache_dir:
+        BlockCache.preferences['path'] = os.path.abspath(x.cache_dir) # FUSE may change working directory.
+        InfoCache.preferences['path'] = os.path.join(BlockCache.preferences['path'], "info.sqlite")
+        MetaCache.preferences['path'] = os.path.join(BlockCache.preferences['path'], "meta")
+
+    if x.cache_size:
+        BlockCache.preferences['size'] = x.cache_size
+
     if x.m:
         for m in x.m.split(','):
             YTActions.preferences['metadata'][m] = True
@@ -749,6 +874,12 @@ def main():
 
     print("Mounting YTFS ver. " + __version__ + ".\nIf you encounter any bugs, please open an issue on GitHub: https://github.com/rasguanabana/ytfs")
 
+    if x.d:
+        Thread(target=report, args=(60,), daemon=True).start()
+
     FUSE(YTFS(), x.MOUNTPOINT[0], foreground=x.d, allow_other=x.allow_other)
 
+    if x.d:
+        print(stats(), file=sys.stderr)
+
 if __name__ == '__main__': main()